@@ -1,24 +1,38 @@
 from flask import Flask
-from .extensions import db, jwt
+from .extensions import (cart_buffer, compressor, db, jwt, password_hasher, reference_cache, replicas,
+                         telegram_user_cache)
 from .config import Config
+from .serializers import JSONProvider
+from . import instrumentation, metrics
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.json = JSONProvider(app)
 
     db.init_app(app)
     jwt.init_app(app)
+    password_hasher.init_app(app)
+    reference_cache.init_app(app)
+    telegram_user_cache.init_app(app)
+    cart_buffer.init_app(app)
+    replicas.init_app(app)
+    instrumentation.init_app(app)
+    metrics.init_app(app)
+    compressor.init_app(app)
 
     from .routes.views import bp as views_bp
     from .routes.auth import bp as auth_bp
     from .routes.products import bp as products_bp
     from .routes.orders import bp as orders_bp
     from .routes.admin import bp as admin_bp
+    from .routes.cart import bp as cart_bp
 
     app.register_blueprint(views_bp)
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(products_bp, url_prefix='/api')
     app.register_blueprint(orders_bp, url_prefix='/api')
     app.register_blueprint(admin_bp, url_prefix='/api')
+    app.register_blueprint(cart_bp, url_prefix='/api')
 
     return app
\ No newline at end of file
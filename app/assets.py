@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from flask import Response, current_app, render_template, request
+
+try:
+    import brotli
+except ImportError:  # brotli اختیاری است؛ بدون آن فقط نسخه gzip ساخته می‌شود
+    brotli = None
+
+# صفحه‌های فروشگاه context پویا ندارند؛ یک بار موقع build رندر می‌شوند و JS/CSS درون‌خطی
+# به فایل‌های با hash محتوا منتقل می‌شوند تا مرورگر آن‌ها را برای همیشه کش کند
+
+PAGES = {'home': 'index.html', 'admin_login': 'admin_login.html'}
+ENCODINGS = ('br', 'gzip')
+SUFFIX = {'br': '.br', 'gzip': '.gz'}
+MIMETYPES = {'.html': 'text/html; charset=utf-8', '.js': 'text/javascript; charset=utf-8',
+             '.css': 'text/css; charset=utf-8'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+MANIFEST = 'manifest.json'
+INLINE_MAX = 1024
+
+_INLINE = re.compile(r'<(script|style)>(.*?)</\1>', re.S)
+_COMMENT = re.compile(r'<!--.*?-->', re.S)
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _strip(source):
+    # فقط تورفتگی و خطوط خالی حذف می‌شوند؛ خط‌ها به هم نمی‌چسبند تا رفتار JS (ASI) عوض نشود
+    return '\n'.join(line.strip() for line in source.splitlines() if line.strip()) + '\n'
+
+
+def _write(out_dir, name, data):
+    with open(os.path.join(out_dir, name), 'wb') as f:
+        f.write(data)
+    # mtime=0 تا build تکراری دقیقاً همان بایت‌ها را بدهد
+    with open(os.path.join(out_dir, name + SUFFIX['gzip']), 'wb') as f:
+        f.write(gzip.compress(data, 9, mtime=0))
+    if brotli is not None:
+        with open(os.path.join(out_dir, name + SUFFIX['br']), 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build(app, out_dir=None):
+    out_dir = out_dir or app.config['ASSET_BUILD_DIR']
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {'pages': {}, 'assets': []}
+    with app.test_request_context():
+        for endpoint, template in PAGES.items():
+            page = os.path.splitext(template)[0]
+
+            def extract(match):
+                kind, body = match.group(1), _strip(match.group(2)).encode()
+                if len(body) < INLINE_MAX:
+                    # بلوک‌های کوچک ارزش یک درخواست جدا را ندارند
+                    return f'<{kind}>{body.decode()}</{kind}>'
+                name = f"{page}.{_digest(body)}.{'js' if kind == 'script' else 'css'}"
+                _write(out_dir, name, body)
+                manifest['assets'].append(name)
+                if kind == 'script':
+                    return f'<script src="/assets/{name}"></script>'
+                return f'<link rel="stylesheet" href="/assets/{name}">'
+
+            html = _INLINE.sub(extract, render_template(template))
+            html = _strip(_COMMENT.sub('', html)).encode()
+            _write(out_dir, template, html)
+            manifest['pages'][endpoint] = {'file': template, 'etag': _digest(html)}
+    with open(os.path.join(out_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class BuiltAssets:
+    # فایل‌های build یک بار در حافظه پروسه خوانده می‌شوند؛ پاسخ‌ها کپی مستقیم همان بایت‌ها هستند
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.pages = {}
+        self._files = {}
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+        for endpoint, page in manifest['pages'].items():
+            self.pages[endpoint] = page
+            self._load(page['file'])
+        for name in manifest['assets']:
+            self._load(name)
+
+    def _load(self, name):
+        variants = {}
+        for encoding in (None,) + ENCODINGS:
+            path = os.path.join(self.out_dir, name + (SUFFIX[encoding] if encoding else ''))
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    variants[encoding] = f.read()
+        self._files[name] = variants
+
+    def __contains__(self, name):
+        return name in self._files
+
+    def response(self, name, etag, cache_control):
+        variants = self._files[name]
+        accepted = request.accept_encodings
+        encoding = next((e for e in ENCODINGS if e in variants and accepted[e]), None)
+        resp = Response(variants[encoding], content_type=MIMETYPES[os.path.splitext(name)[1]])
+        if encoding:
+            resp.headers['Content-Encoding'] = encoding
+        resp.headers['Vary'] = 'Accept-Encoding'
+        resp.headers['Cache-Control'] = cache_control
+        # هر encoding نمایش جداگانه‌ای است و ETag خودش را می‌خواهد
+        resp.set_etag(f'{etag}-{encoding}' if encoding else etag)
+        return resp.make_conditional(request)
+
+
+_built = {}
+_built_lock = threading.Lock()
+
+
+def built_assets():
+    out_dir = current_app.config['ASSET_BUILD_DIR']
+    with _built_lock:
+        if out_dir not in _built:
+            # بدون build (مثلاً محیط توسعه) صفحه‌ها مثل قبل با render_template ساخته می‌شوند
+            _built[out_dir] = BuiltAssets(out_dir) if os.path.exists(os.path.join(out_dir, MANIFEST)) else None
+    return _built[out_dir]
+
+
+def page_response(endpoint):
+    assets = built_assets()
+    if assets is None or endpoint not in assets.pages:
+        return render_template(PAGES[endpoint])
+    page = assets.pages[endpoint]
+    # HTML هر بار با ETag اعتبارسنجی می‌شود (304 بدون بدنه)؛ فقط فایل‌های hash‌دار immutable هستند
+    return assets.response(page['file'], page['etag'], 'no-cache')
+
+
+def asset_response(name):
+    assets = built_assets()
+    if assets is None or name not in assets or name in {p['file'] for p in assets.pages.values()}:
+        return None
+    return assets.response(name, name.split('.')[1], IMMUTABLE)
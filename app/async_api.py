@@ -0,0 +1,179 @@
+import time
+from contextlib import asynccontextmanager
+import jwt as pyjwt
+from a2wsgi import WSGIMiddleware
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from .cache import CachedJSON
+from .extensions import compressor, get_async_engine, reference_cache
+from .instrumentation import track
+from .metrics import http_db_time, http_errors, http_latency, http_requests
+from .models import Order, Product
+from .pagination import InvalidCursor, clamp_limit, decode_cursor, keyset_query, split_page
+from .search import MAX_RESULTS, search_products
+from .serializers import CATEGORY, ORDER, PRODUCT, SELLER
+from .streaming import BATCH_SIZE, FLUSH_EVERY, wants_stream
+
+# حالت ASGI: مسیرهای پرترافیک خواندنی (کاتالوگ و تاریخچه سفارش) روی event loop و درایور async اجرا می‌شوند
+# و بقیه مسیرها (نوشتن، پنل مدیریت، webhook ربات) بدون تغییر به همان اپ Flask می‌رسند.
+
+
+class Unauthorized(Exception):
+    def __init__(self, msg, status=401):
+        super().__init__(msg)
+        self.msg = msg
+        self.status = status
+
+
+def create_asgi_app(flask_app):
+    config = flask_app.config
+    engine = get_async_engine(config)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    dumps = flask_app.json.dumps
+
+    def json_response(data, status=200, headers=None):
+        return Response(dumps(data) + '\n', status, headers, media_type='application/json')
+
+    def identity(request):
+        # همان توکن flask_jwt_extended؛ کلید، الگوریتم و claimها از تنظیمات اپ Flask خوانده می‌شوند
+        header = request.headers.get('Authorization', '')
+        if not header.startswith('Bearer '):
+            raise Unauthorized('Missing Authorization Header')
+        try:
+            claims = pyjwt.decode(header[7:], config['JWT_SECRET_KEY'],
+                                  algorithms=[config.get('JWT_ALGORITHM', 'HS256')])
+        except pyjwt.ExpiredSignatureError:
+            raise Unauthorized('Token has expired')
+        except pyjwt.InvalidTokenError as e:
+            raise Unauthorized(str(e), 422)
+        if claims.get('type') != 'access':
+            raise Unauthorized('Only non-refresh tokens are allowed', 422)
+        return int(claims[config.get('JWT_IDENTITY_CLAIM', 'sub')])
+
+    def traced(view):
+        # معادل hookهای Flask: شمارش کوئری‌ها، Server-Timing، بودجه کوئری و متریک‌های HTTP (blueprint=asgi)
+        name = view.__name__
+
+        async def wrapper(request):
+            started = time.perf_counter()
+            status = 500
+            try:
+                with track(f'asgi:{name}', budget=config.get('SQL_QUERY_BUDGET'),
+                           strict=config.get('SQL_QUERY_BUDGET_STRICT')) as trace:
+                    try:
+                        response = await view(request)
+                    except Unauthorized as e:
+                        response = json_response({'msg': e.msg}, e.status)
+                status = response.status_code
+            finally:
+                http_requests.labels('asgi', name, request.method, status).inc()
+                if status >= 500:
+                    http_errors.labels('asgi', name).inc()
+                http_latency.labels('asgi', name).observe(time.perf_counter() - started)
+            http_db_time.labels('asgi', name).observe(trace.total)
+            response.headers.append('Server-Timing', f'db;dur={trace.total * 1000:.1f};desc="{trace.count} queries"')
+            return response
+        wrapper.__name__ = name
+        return wrapper
+
+    def cached(request, entry):
+        headers = {'ETag': f'"{entry.etag}"', 'Cache-Control': f'public, max-age={int(reference_cache.ttl)}'}
+        if entry.etag in request.headers.get('If-None-Match', ''):
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, headers=headers, media_type='application/json')
+
+    async def reference(request, key, projection):
+        # همان ورودی کش Flask؛ نوشتن از مسیرهای Flask آن را باطل می‌کند
+        entry = reference_cache.get(key)
+        if entry is None:
+            generation = reference_cache.generation
+            async with Session() as session:
+                rows = (await session.execute(projection.select())).all()
+            entry = CachedJSON(projection.rows(rows), dumps)
+            reference_cache.set(key, entry, generation)
+        return cached(request, entry)
+
+    async def stream_rows(projection, statement, fmt):
+        async with Session() as session:
+            result = await session.stream(statement.execution_options(yield_per=BATCH_SIZE))
+            sep = ''
+            if fmt == 'json':
+                yield '['
+            async for rows in result.partitions(FLUSH_EVERY):
+                if fmt == 'ndjson':
+                    yield ''.join(dumps(projection.row(r)) + '\n' for r in rows)
+                else:
+                    yield sep + ','.join(dumps(projection.row(r)) for r in rows)
+                    sep = ','
+            if fmt == 'json':
+                yield ']'
+
+    @traced
+    async def categories(request):
+        return await reference(request, 'categories', CATEGORY)
+
+    @traced
+    async def sellers(request):
+        stream = wants_stream(request.query_params, request.headers)
+        if stream:
+            media_type = 'application/x-ndjson' if stream == 'ndjson' else 'application/json'
+            return StreamingResponse(stream_rows(SELLER, SELLER.select(), stream), media_type=media_type)
+        return await reference(request, 'sellers', SELLER)
+
+    @traced
+    async def products(request):
+        args = request.query_params
+        search = args.get('search')
+        limit = clamp_limit(args.get('limit', args.get('per_page')))
+        try:
+            after = decode_cursor(args.get('after'))
+        except InvalidCursor:
+            return json_response({'error': 'پارامتر after نامعتبر است'}, 400)
+        try:
+            cat_id = int(args['category_id']) if args.get('category_id') else None
+        except ValueError:
+            return json_response({'error': 'پارامتر category_id نامعتبر است'}, 400)
+
+        async with Session() as session:
+            if search:
+                if after is not None:
+                    return json_response({'error': 'پارامتر after در جستجو پشتیبانی نمی‌شود'}, 400)
+                # جستجو همان کد همگام است و داخل greenlet روی اتصال async اجرا می‌شود
+                items = await session.run_sync(search_products, search, min(limit, MAX_RESULTS), cat_id,
+                                               columns=PRODUCT.columns)
+                return json_response({'products': PRODUCT.rows(items), 'next_cursor': None})
+
+            query = PRODUCT.select().where(Product.is_active.is_(True))
+            if cat_id: query = query.where(Product.category_id == cat_id)
+            rows = (await session.execute(keyset_query(query, Product.product_id, after, limit))).all()
+        items, next_cursor = split_page(rows, Product.product_id, limit)
+        return json_response({'products': PRODUCT.rows(items), 'next_cursor': next_cursor})
+
+    @traced
+    async def orders(request):
+        uid = identity(request)
+        async with Session() as session:
+            rows = (await session.execute(
+                ORDER.select().where(Order.user_id == uid).order_by(Order.order_id.desc()))).all()
+        return json_response(ORDER.rows(rows))
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await engine.dispose()
+
+    # فشرده‌سازی فقط روی مسیرهای async؛ پاسخ مسیرهای Flask قبلاً در middleware خود Flask فشرده شده‌اند
+    gzip = [Middleware(GZipMiddleware, minimum_size=compressor.min_size, compresslevel=compressor.level or 6)]
+
+    # POST روی همین مسیرها با Route جور نمی‌شود و به Mount (اپ Flask) می‌رسد
+    return Starlette(routes=[
+        Route('/api/categories', categories, methods=['GET'], middleware=gzip),
+        Route('/api/sellers', sellers, methods=['GET'], middleware=gzip),
+        Route('/api/products', products, methods=['GET'], middleware=gzip),
+        Route('/api/orders', orders, methods=['GET'], middleware=gzip),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=config.get('ASGI_WSGI_WORKERS', 8))),
+    ], lifespan=lifespan)
@@ -0,0 +1,286 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import bindparam, insert, select, text, update
+from .models import Category, Product, Seller
+
+CHUNK_SIZE = 5000
+MAX_ERRORS = 100
+FORMATS = ('csv', 'jsonl')
+
+COLUMNS = ('product_id', 'seller_id', 'category_id', 'name', 'description', 'price', 'stock', 'is_active')
+_TRUE = {'1', 'true', 'yes', 'y', 't'}
+_FALSE = {'0', 'false', 'no', 'n', 'f'}
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def to_dict(self):
+        return {'inserted': self.inserted, 'updated': self.updated, 'rejected': self.rejected, 'errors': self.errors}
+
+
+def detect_format(filename=None, content_type=None, default='csv'):
+    name = (filename or '').lower()
+    ctype = (content_type or '').lower()
+    if name.endswith(('.jsonl', '.ndjson')) or 'ndjson' in ctype or 'jsonl' in ctype:
+        return 'jsonl'
+    if name.endswith('.csv') or 'csv' in ctype:
+        return 'csv'
+    return default
+
+
+def iter_records(stream, fmt):
+    # خطای خواندن فایل (encoding یا CSV خراب) خطای کاربر است؛ بقیه خطاها (مثل دیتابیس) بالا می‌روند
+    try:
+        yield from _read_records(stream, fmt)
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ImportFormatError(f'فایل قابل خواندن نیست: {e}')
+
+
+def _read_records(stream, fmt):
+    # فایل خط به خط خوانده می‌شود؛ هیچ‌وقت کل آپلود در حافظه نیست
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text_stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_no, line in enumerate(text_stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_no, None
+            continue
+        yield line_no, record if isinstance(record, dict) else None
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _int(record, key, required=False, minimum=None):
+    value = record.get(key)
+    if _blank(value):
+        if required:
+            raise RowError(f'{key} الزامی است')
+        return None
+    try:
+        value = int(str(value).strip())
+    except ValueError:
+        raise RowError(f'{key} باید عدد صحیح باشد')
+    if minimum is not None and value < minimum:
+        raise RowError(f'{key} نباید کمتر از {minimum} باشد')
+    return value
+
+
+def validate(record, sellers, categories):
+    if record is None:
+        raise RowError('ردیف قابل خواندن نیست')
+
+    name = record.get('name')
+    if _blank(name):
+        raise RowError('نام الزامی است')
+    name = str(name).strip()
+    if len(name) > 200:
+        raise RowError('نام بیش از ۲۰۰ کاراکتر است')
+
+    try:
+        price = Decimal(str(record.get('price')).strip()).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise RowError('قیمت نامعتبر است')
+    if not price.is_finite() or price < 0 or price >= Decimal('1e10'):
+        raise RowError('قیمت نامعتبر است')
+
+    seller_id = _int(record, 'seller_id', required=True)
+    if seller_id not in sellers:
+        raise RowError(f'فروشنده {seller_id} وجود ندارد')
+    category_id = _int(record, 'category_id', required=True)
+    if category_id not in categories:
+        raise RowError(f'دسته {category_id} وجود ندارد')
+
+    is_active = record.get('is_active')
+    if _blank(is_active):
+        is_active = True
+    elif not isinstance(is_active, bool):
+        flag = str(is_active).strip().lower()
+        if flag not in _TRUE | _FALSE:
+            raise RowError('is_active نامعتبر است')
+        is_active = flag in _TRUE
+
+    description = record.get('description')
+    return {
+        'product_id': _int(record, 'product_id', minimum=1),
+        'seller_id': seller_id,
+        'category_id': category_id,
+        'name': name,
+        'description': None if _blank(description) else str(description),
+        'price': price,
+        'stock': _int(record, 'stock', minimum=0) or 0,
+        'is_active': is_active,
+    }
+
+
+def _chunks(records, result, sellers, categories, size):
+    chunk, by_id = [], {}
+    for line, record in records:
+        try:
+            row = validate(record, sellers, categories)
+        except RowError as e:
+            result.reject(line, str(e))
+            continue
+        row['line'] = line
+        pid = row['product_id']
+        if pid is not None and pid in by_id:
+            # در یک chunk فقط آخرین نسخه هر محصول اعمال می‌شود
+            chunk[by_id[pid]] = None
+        if pid is not None:
+            by_id[pid] = len(chunk)
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield [r for r in chunk if r is not None]
+            chunk, by_id = [], {}
+    chunk = [r for r in chunk if r is not None]
+    if chunk:
+        yield chunk
+
+
+def _copy_rows(conn, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for r in rows:
+        writer.writerow([r['line'], r['product_id'], r['seller_id'], r['category_id'], r['name'],
+                         r['description'], r['price'], r['stock'], r['is_active']])
+    sql = ('COPY product_import (line, product_id, seller_id, category_id, name, description, price, stock, is_active) '
+           'FROM STDIN WITH (FORMAT csv)')
+    cursor = conn.connection.cursor()
+    try:
+        if hasattr(cursor, 'copy'):
+            with cursor.copy(sql) as copy:
+                copy.write(buf.getvalue())
+        else:
+            buf.seek(0)
+            cursor.copy_expert(sql, buf)
+    finally:
+        cursor.close()
+
+
+def _load_postgres(conn, chunks, result):
+    conn.execute(text("""
+        CREATE TEMP TABLE product_import (
+            line integer, product_id integer, seller_id integer, category_id integer, name varchar(200),
+            description text, price numeric(12, 2), stock integer, is_active boolean
+        ) ON COMMIT DROP
+    """))
+    for rows in chunks:
+        _copy_rows(conn, rows)
+        for (line, pid) in conn.execute(text("""
+            SELECT s.line, s.product_id FROM product_import s
+            WHERE s.product_id IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM product p WHERE p.product_id = s.product_id)
+        """)):
+            result.reject(line, f'محصول {pid} وجود ندارد')
+        result.updated += conn.execute(text("""
+            UPDATE product p SET seller_id = s.seller_id, category_id = s.category_id, name = s.name,
+                description = s.description, price = s.price, stock = s.stock, is_active = s.is_active,
+                updated_at = now() AT TIME ZONE 'utc'
+            FROM product_import s
+            WHERE s.product_id IS NOT NULL AND p.product_id = s.product_id
+        """)).rowcount
+        result.inserted += conn.execute(text("""
+            INSERT INTO product (seller_id, category_id, name, description, price, stock, is_active, created_at)
+            SELECT seller_id, category_id, name, description, price, stock, is_active, now() AT TIME ZONE 'utc'
+            FROM product_import WHERE product_id IS NULL
+        """)).rowcount
+        conn.execute(text('TRUNCATE product_import'))
+
+
+def _load_executemany(conn, chunks, result):
+    t = Product.__table__
+    stmt = (update(t).where(t.c.product_id == bindparam('b_product_id'))
+            .values({c: bindparam(f'b_{c}') for c in COLUMNS[1:] + ('updated_at',)}))
+    for rows in chunks:
+        now = datetime.utcnow()
+        ids = [r['product_id'] for r in rows if r['product_id'] is not None]
+        existing = set(conn.execute(select(t.c.product_id).where(t.c.product_id.in_(ids))).scalars()) if ids else set()
+
+        updates, inserts = [], []
+        for r in rows:
+            pid = r.pop('product_id')
+            line = r.pop('line')
+            if pid is None:
+                inserts.append({**r, 'created_at': now})
+            elif pid in existing:
+                updates.append({f'b_{k}': v for k, v in r.items()} | {'b_product_id': pid, 'b_updated_at': now})
+            else:
+                result.reject(line, f'محصول {pid} وجود ندارد')
+        if updates:
+            conn.execute(stmt, updates)
+            result.updated += len(updates)
+        if inserts:
+            conn.execute(insert(t), inserts)
+            result.inserted += len(inserts)
+
+
+def import_products(engine, stream, fmt='csv', chunk_size=CHUNK_SIZE):
+    if fmt not in FORMATS:
+        raise ValueError(f'فرمت {fmt} پشتیبانی نمی‌شود')
+    result = ImportResult()
+    # کل ورود در یک تراکنش است؛ یا همه ردیف‌های معتبر می‌نشینند یا هیچ‌کدام
+    with engine.begin() as conn:
+        sellers = set(conn.execute(select(Seller.seller_id)).scalars())
+        categories = set(conn.execute(select(Category.category_id)).scalars())
+        chunks = _chunks(iter_records(stream, fmt), result, sellers, categories, chunk_size)
+        if engine.dialect.name == 'postgresql':
+            _load_postgres(conn, chunks, result)
+        else:
+            _load_executemany(conn, chunks, result)
+    return result
+
+
+def export_products(engine, fmt='csv', batch_size=CHUNK_SIZE):
+    if fmt not in FORMATS:
+        raise ValueError(f'فرمت {fmt} پشتیبانی نمی‌شود')
+    columns = [getattr(Product, c) for c in COLUMNS]
+    # server-side cursor: ردیف‌ها دسته به دسته از دیتابیس خوانده و بلافاصله نوشته می‌شوند
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+            select(*columns).order_by(Product.product_id))
+        if fmt == 'csv':
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(COLUMNS)
+            for rows in result.partitions():
+                for r in rows:
+                    writer.writerow(r)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            if buf.tell():
+                yield buf.getvalue()
+            return
+        for rows in result.partitions():
+            yield ''.join(json.dumps({
+                **r._asdict(), 'price': float(r.price)
+            }, ensure_ascii=False) + '\n' for r in rows)
@@ -0,0 +1,125 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+_MISSING = object()
+_registry = {}
+
+
+class TTLCache:
+    def __init__(self, name, ttl=300, maxsize=None, config_prefix=None):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.config_prefix = config_prefix
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def init_app(self, app):
+        if self.config_prefix:
+            self.ttl = app.config.get(f'{self.config_prefix}_TTL', self.ttl)
+            self.maxsize = app.config.get(f'{self.config_prefix}_MAXSIZE', self.maxsize)
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                # بین شروع خواندن و این set یک invalidate رخ داده؛ مقدار ممکن است قدیمی باشد
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            if self.maxsize:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            generation = self.generation
+            value = loader()
+            self.set(key, value, generation)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            self.generation += 1
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def registered_caches():
+    return dict(_registry)
+
+
+class CachedJSON:
+    __slots__ = ('body', 'etag')
+
+    def __init__(self, data, dumps=None):
+        self.body = (dumps or current_app.json.dumps)(data).encode('utf-8')
+        self.etag = hashlib.sha1(self.body).hexdigest()
+
+
+def cached_json(cache, key, max_age=None):
+    # خروجی view (داده پایتونی) یک بار سریال می‌شود؛ درخواست‌های بعدی و 304 به دیتابیس نمی‌رسند.
+    # max_age پیش‌فرض همان TTL کش سرور است تا کلاینت بیشتر از خود سرور نسخه قدیمی نگه ندارد
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            entry = cache.get_or_load(key, lambda: CachedJSON(view(*args, **kwargs)))
+            resp = Response(entry.body, mimetype='application/json')
+            resp.set_etag(entry.etag)
+            resp.cache_control.public = True
+            resp.cache_control.max_age = int(cache.ttl if max_age is None else max_age)
+            return resp.make_conditional(request)
+        return wrapper
+    return decorator
+
+
+def invalidate_on_write(cache, key, *models):
+    # باطل کردن بعد از commit انجام می‌شود؛ خواننده‌ای که قبل از commit کوئری زده و بعد از آن set می‌کند
+    # با generation عوض‌شده روبه‌رو می‌شود و مقدار قدیمی‌اش کش نمی‌شود
+    def mark(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault('cache_invalidations', set()).add((cache, key))
+
+    for model in models:
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, name, mark)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    for cache, key in session.info.pop('cache_invalidations', ()):
+        cache.invalidate(key)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('cache_invalidations', None)
@@ -0,0 +1,133 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CartWriteBuffer:
+    # افزودن‌های پشت‌سرهم به سبد در حافظه جمع می‌شوند و هر window ثانیه با یک upsert چندردیفی نوشته می‌شوند.
+    # هر مسیری که سبد را می‌خواند (نمایش سبد، checkout) اول flush(user_id) را صدا می‌زند.
+    # بافر مال همین پروسه است؛ پروسه‌های دیگر حداکثر تا window ثانیه تغییرات را دیرتر می‌بینند.
+    def __init__(self, window=0.5, max_pending=10000, max_retries=3):
+        self.window = window
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self._pending = {}
+        self._retries = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pid = None
+        self.adds = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+        self.dropped = 0
+
+    def init_app(self, app):
+        self.window = app.config.get('CART_WRITE_WINDOW', self.window)
+        self.max_pending = app.config.get('CART_WRITE_MAX_PENDING', self.max_pending)
+        self.max_retries = app.config.get('CART_WRITE_MAX_RETRIES', self.max_retries)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() or self.window <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name='cart-write-buffer', daemon=True).start()
+            self._pid = os.getpid()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.window)
+            if self._size:
+                self.flush()
+
+    def add(self, user_id, product_id, quantity=1):
+        self._ensure_started()
+        with self._lock:
+            lines = self._pending.setdefault(user_id, {})
+            if product_id not in lines:
+                self._size += 1
+            lines[product_id] = lines.get(product_id, 0) + quantity
+            self.adds += 1
+            full = self._size >= self.max_pending
+        if full or self.window <= 0:
+            self.flush()
+
+    def _take(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                taken, self._pending = self._pending, {}
+            else:
+                lines = self._pending.pop(user_id, None)
+                taken = {user_id: lines} if lines else {}
+            self._size -= sum(len(lines) for lines in taken.values())
+        return taken
+
+    def discard(self, user_id):
+        self._take(user_id)
+        self._retries.pop(user_id, None)
+
+    def _write(self, lines):
+        from .carts import increment_lines
+        from .extensions import get_engine
+        from sqlalchemy.orm import Session
+
+        # خط محصولی که دیگر وجود ندارد یا غیرفعال شده را increment_lines کنار می‌گذارد و دوباره صف نمی‌شود
+        with Session(get_engine()) as session:
+            written = increment_lines(session, lines)
+            session.commit()
+        return written
+
+    def _requeue(self, user_id, items):
+        self._retries[user_id] = self._retries.get(user_id, 0) + 1
+        if self._retries[user_id] > self.max_retries:
+            self._retries.pop(user_id)
+            self.dropped += len(items)
+            logger.error('Cart buffer dropped %s lines of user %s after %s failed flushes',
+                         len(items), user_id, self.max_retries)
+            return
+        with self._lock:
+            pending = self._pending.setdefault(user_id, {})
+            for pid, qty in items.items():
+                if pid not in pending:
+                    self._size += 1
+                pending[pid] = pending.get(pid, 0) + qty
+
+    def flush(self, user_id=None):
+        # قفل flush تضمین می‌کند خواننده منتظر نوشتنِ در جریانِ thread پس‌زمینه بماند
+        with self._flush_lock:
+            taken = self._take(user_id)
+            if not taken:
+                return 0
+            lines = {(uid, pid): qty for uid, items in taken.items() for pid, qty in items.items()}
+            try:
+                written = self._write(lines)
+                for uid in taken:
+                    self._retries.pop(uid, None)
+            except Exception:
+                # یک خط خراب نباید کل دسته را نگه دارد: هر کاربر جداگانه دوباره نوشته می‌شود
+                # و فقط خط‌های کاربرِ خراب، حداکثر max_retries بار، دوباره صف می‌شوند
+                self.failures += 1
+                logger.exception('Cart buffer batch flush failed; retrying %s users one by one', len(taken))
+                written = 0
+                for uid, items in taken.items():
+                    try:
+                        written += self._write({(uid, pid): qty for pid, qty in items.items()})
+                        self._retries.pop(uid, None)
+                    except Exception:
+                        logger.exception('Cart buffer flush failed for user %s; %s lines re-queued', uid, len(items))
+                        self._requeue(uid, items)
+            self.flushes += 1
+            self.rows_written += written
+            return written
+
+    def stats(self):
+        return {'pending': self._size, 'adds': self.adds, 'flushes': self.flushes,
+                'rows_written': self.rows_written, 'failures': self.failures, 'dropped': self.dropped}
@@ -0,0 +1,125 @@
+from sqlalchemy import case, delete, select, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from .models import Cart, Product
+
+MAX_QUANTITY = 1000
+OPS = ('set', 'increment', 'remove')
+
+
+def merge_ops(ops):
+    # چند عملیات روی یک محصول در یک درخواست به یک عملیات نهایی تبدیل می‌شوند:
+    # ('set', n) مقدار مطلق، ('increment', n) نسبی، ('remove', None)
+    final = {}
+    for op in ops:
+        kind = op.get('op', 'increment')
+        if kind not in OPS:
+            raise ValueError(f'عملیات {kind} نامعتبر است')
+        pid = int(op['product_id'])
+        if kind == 'remove':
+            final[pid] = ('remove', None)
+            continue
+        qty = int(op.get('quantity', 1))
+        if kind == 'set' and qty < 0:
+            raise ValueError(f'تعداد نامعتبر برای محصول {pid}')
+        prev_kind, prev_qty = final.get(pid, (None, None))
+        if kind == 'increment' and prev_kind == 'set':
+            kind, qty = 'set', prev_qty + qty
+        elif kind == 'increment' and prev_kind == 'remove':
+            kind = 'set'
+        elif kind == 'increment' and prev_kind == 'increment':
+            qty += prev_qty
+        final[pid] = ('remove', None) if kind == 'set' and qty <= 0 else (kind, qty)
+    return final
+
+
+def _insert(session):
+    return (postgresql if session.get_bind().dialect.name == 'postgresql' else sqlite).insert(Cart)
+
+
+def apply_ops(session, user_id, ops):
+    final = merge_ops(ops)
+    if not final:
+        return
+
+    wanted = [pid for pid, (kind, _) in final.items() if kind != 'remove']
+    if wanted:
+        active = set(session.execute(select(Product.product_id).where(
+            Product.product_id.in_(wanted), Product.is_active.is_(True))).scalars())
+        missing = [pid for pid in wanted if pid not in active]
+        if missing:
+            raise ValueError(f"محصول {'، '.join(map(str, missing))} موجود نیست")
+
+    removes = [pid for pid, (kind, _) in final.items() if kind == 'remove']
+    sets = [{'user_id': user_id, 'product_id': pid, 'quantity': min(qty, MAX_QUANTITY)}
+            for pid, (kind, qty) in final.items() if kind == 'set']
+    increments = [{'user_id': user_id, 'product_id': pid, 'quantity': min(qty, MAX_QUANTITY)}
+                  for pid, (kind, qty) in final.items() if kind == 'increment' and qty]
+
+    # هر نوع عملیات فقط یک دستور SQL است، هرچقدر هم خط در درخواست باشد
+    if removes:
+        session.execute(delete(Cart).where(Cart.user_id == user_id, Cart.product_id.in_(removes)))
+    if sets:
+        stmt = _insert(session).values(sets)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[Cart.user_id, Cart.product_id], set_={'quantity': stmt.excluded.quantity}))
+    if increments:
+        _upsert_increments(session, increments)
+
+
+def _upsert_increments(session, rows):
+    stmt = _insert(session).values(rows)
+    summed = Cart.quantity + stmt.excluded.quantity
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=[Cart.user_id, Cart.product_id],
+        set_={'quantity': case((summed > MAX_QUANTITY, MAX_QUANTITY), else_=summed)}))
+    # کاهش روی خطی که هنوز در سبد نیست ردیفی با تعداد منفی می‌سازد؛ این ردیف‌ها همان‌جا حذف می‌شوند
+    decremented = [(r['user_id'], r['product_id']) for r in rows if r['quantity'] <= 0]
+    if decremented:
+        session.execute(delete(Cart).where(
+            tuple_(Cart.user_id, Cart.product_id).in_(decremented), Cart.quantity <= 0))
+
+
+def increment_lines(session, lines):
+    # lines: {(user_id, product_id): quantity} برای چند کاربر؛ یک SELECT و یک upsert برای کل دسته
+    active = set(session.execute(select(Product.product_id).where(
+        Product.product_id.in_({pid for _, pid in lines}), Product.is_active.is_(True))).scalars())
+    rows = [{'user_id': uid, 'product_id': pid, 'quantity': min(qty, MAX_QUANTITY)}
+            for (uid, pid), qty in lines.items() if pid in active and qty]
+    if rows:
+        _upsert_increments(session, rows)
+    return len(rows)
+
+
+def cart_summary(session, user_id):
+    # قیمت هر خط و جمع کل در خود SQL حساب می‌شوند؛ یک رفت‌وبرگشت برای کل سبد
+    rows = session.execute(text("""
+        SELECT c.product_id, p.name, p.price, c.quantity, p.stock, p.is_active,
+               p.price * c.quantity AS line_total,
+               SUM(p.price * c.quantity) OVER () AS total,
+               SUM(c.quantity) OVER () AS count
+        FROM cart c JOIN product p ON p.product_id = c.product_id
+        WHERE c.user_id = :uid
+        ORDER BY c.product_id
+    """), {'uid': user_id}).all()
+    return {
+        'items': [{
+            'product_id': r.product_id, 'name': r.name, 'price': float(r.price), 'quantity': r.quantity,
+            'line_total': float(r.line_total), 'stock': r.stock, 'is_active': bool(r.is_active),
+        } for r in rows],
+        'total': float(rows[0].total) if rows else 0.0,
+        'count': int(rows[0].count) if rows else 0,
+    }
+
+
+def cart_items(session, user_id, lock=False):
+    stmt = select(Cart.product_id, Cart.quantity).where(Cart.user_id == user_id).order_by(Cart.product_id)
+    if lock:
+        stmt = stmt.with_for_update()
+    return [{'product_id': pid, 'quantity': qty} for pid, qty in session.execute(stmt)]
+
+
+def clear_cart(session, user_id, product_ids=None):
+    stmt = delete(Cart).where(Cart.user_id == user_id)
+    if product_ids is not None:
+        stmt = stmt.where(Cart.product_id.in_(product_ids))
+    session.execute(stmt)
@@ -0,0 +1,214 @@
+import threading
+import time
+import zlib
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # brotli اختیاری است؛ بدون آن فقط gzip
+    brotli = None
+
+COMPRESSIBLE = ('application/json', 'application/x-ndjson', 'text/')
+SKIP_STATUS = (204, 206, 304)
+
+
+class _Gzip:
+    name = 'gzip'
+
+    def __init__(self, level):
+        # wbits=31: قالب gzip (هدر و CRC) به جای zlib خام
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def process(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    name = 'br'
+
+    def __init__(self, quality):
+        self._c = brotli.Compressor(quality=quality)
+
+    def process(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+class ResponseCompressor:
+    # middleware در سطح WSGI: پاسخ‌های متنی/JSON بزرگ‌تر از min_size فشرده می‌شوند.
+    # پاسخ با Content-Length یک‌جا فشرده می‌شود و اگر صرفه نداشت همان نسخه خام می‌رود؛
+    # پاسخ جریانی (بدون Content-Length) تکه‌به‌تکه با sync flush فشرده می‌شود تا کلاینت منتظر نماند.
+    def __init__(self, min_size=1024, level=6, brotli_quality=4, min_ratio=0.9):
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.min_ratio = min_ratio
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.streamed = 0
+        self.skipped = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def init_app(self, app):
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', self.min_size)
+        self.level = app.config.get('COMPRESS_LEVEL', self.level)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', self.brotli_quality)
+        self.min_ratio = app.config.get('COMPRESS_MIN_RATIO', self.min_ratio)
+        if self.level > 0:
+            app.wsgi_app = _Middleware(app.wsgi_app, self)
+
+    def _skip(self, reason):
+        with self._lock:
+            self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def _record(self, raw, out, cpu, streamed=False):
+        with self._lock:
+            self.bytes_in += raw
+            self.bytes_out += out
+            self.cpu_seconds += cpu
+            if streamed:
+                self.streamed += 1
+            else:
+                self.compressed += 1
+
+    def encoder(self, accept_encoding):
+        accepted = parse_accept_header(accept_encoding)
+        if brotli is not None and self.brotli_quality >= 0 and accepted['br']:
+            return _Brotli(self.brotli_quality)
+        if accepted['gzip']:
+            return _Gzip(self.level)
+        return None
+
+    def stats(self):
+        data = {'compressed': self.compressed, 'streamed': self.streamed, 'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out, 'bytes_saved': self.bytes_in - self.bytes_out,
+                'cpu_seconds': round(self.cpu_seconds, 4)}
+        data.update({f'skipped_{reason}': n for reason, n in self.skipped.items()})
+        return data
+
+
+class _Middleware:
+    def __init__(self, wsgi_app, compressor):
+        self.wsgi_app = wsgi_app
+        self.compressor = compressor
+
+    def __call__(self, environ, start_response):
+        c = self.compressor
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return self.wsgi_app(environ, start_response)
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured.update(status=status, headers=headers, exc_info=exc_info)
+            return captured.setdefault('body', []).append
+
+        app_iter = self.wsgi_app(environ, capture)
+        status, headers = captured['status'], Headers(captured['headers'])
+        reason = self._skip_reason(int(status.split(' ', 1)[0]), headers)
+        encoder = None
+        if reason is None:
+            # پاسخ به Accept-Encoding بستگی دارد حتی اگر این کلاینت فشرده‌سازی نخواهد
+            headers.add('Vary', 'Accept-Encoding')
+            encoder = c.encoder(environ.get('HTTP_ACCEPT_ENCODING', ''))
+            reason = None if encoder else 'not_accepted'
+        if encoder is None:
+            c._skip(reason)
+            start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+            return self._passthrough(captured.get('body', []), app_iter)
+        if headers.get('Content-Length') is not None:
+            return self._buffered(environ, status, headers, captured, app_iter, encoder, start_response)
+        return self._streamed(status, headers, captured, app_iter, encoder, start_response)
+
+    def _skip_reason(self, code, headers):
+        content_type = headers.get('Content-Type', '')
+        length = headers.get('Content-Length')
+        if code < 200 or code in SKIP_STATUS or headers.get('Content-Range'):
+            return 'status'
+        if headers.get('Content-Encoding'):
+            return 'encoded'
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return 'no_transform'
+        if not content_type.startswith(COMPRESSIBLE):
+            return 'content_type'
+        if length is not None and int(length) < self.compressor.min_size:
+            return 'small'
+        return None
+
+    @staticmethod
+    def _passthrough(pending, app_iter):
+        yield from pending
+        try:
+            yield from app_iter
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+    @staticmethod
+    def _encoded_headers(headers, encoder):
+        headers['Content-Encoding'] = encoder.name
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            # بایت‌های فشرده با نسخه خام یکی نیستند؛ ETag ضعیف همچنان با If-None-Match جور می‌شود
+            headers['ETag'] = 'W/' + etag
+
+    def _buffered(self, environ, status, headers, captured, app_iter, encoder, start_response):
+        c = self.compressor
+        try:
+            raw = b''.join(captured.get('body', [])) + b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        started = time.thread_time()
+        body = encoder.process(raw) + encoder.finish()
+        cpu = time.thread_time() - started
+        if len(body) > len(raw) * c.min_ratio:
+            c._skip('incompressible')
+            with c._lock:
+                c.cpu_seconds += cpu
+            body = raw
+        else:
+            c._record(len(raw), len(body), cpu)
+            self._encoded_headers(headers, encoder)
+        headers['Content-Length'] = str(len(body))
+        start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+        return [body]
+
+    def _streamed(self, status, headers, captured, app_iter, encoder, start_response):
+        c = self.compressor
+        self._encoded_headers(headers, encoder)
+        start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+
+        def generate():
+            raw = out = 0
+            cpu = 0.0
+            try:
+                for chunk in self._passthrough(captured.get('body', []), app_iter):
+                    if not chunk:
+                        continue
+                    started = time.thread_time()
+                    data = encoder.process(chunk) + encoder.flush()
+                    cpu += time.thread_time() - started
+                    raw, out = raw + len(chunk), out + len(data)
+                    yield data
+                started = time.thread_time()
+                data = encoder.finish()
+                cpu += time.thread_time() - started
+                out += len(data)
+                yield data
+            finally:
+                c._record(raw, out, cpu, streamed=True)
+        return generate()
@@ -8,7 +8,43 @@ class Config:
         
     SQLALCHEMY_DATABASE_URI = raw_db_url
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 5))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 300))
+    ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL')
+    ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', 20))
+    ASYNC_DB_MAX_OVERFLOW = int(os.getenv('ASYNC_DB_MAX_OVERFLOW', 10))
+    ASGI_WSGI_WORKERS = int(os.getenv('ASGI_WSGI_WORKERS', 8))
+    DATABASE_REPLICA_URLS = os.getenv('DATABASE_REPLICA_URLS', '')
+    REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', 5))
+    REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', 10))
+    REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', 2))
+    REPLICA_RETRY_AFTER = float(os.getenv('REPLICA_RETRY_AFTER', 30))
+    DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', '').lower() in ('1', 'true', 'yes')
+    SQL_SLOW_QUERY_MS = float(os.getenv('SQL_SLOW_QUERY_MS', 200))
+    SQL_QUERY_BUDGET = int(os.getenv('SQL_QUERY_BUDGET')) if os.getenv('SQL_QUERY_BUDGET') else None
+    SQL_QUERY_BUDGET_STRICT = os.getenv('SQL_QUERY_BUDGET_STRICT', '').lower() in ('1', 'true', 'yes')
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'default-secret-key')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JSON_AS_ASCII = False
-    JSON_SORT_KEYS = False
\ No newline at end of file
+    JSON_SORT_KEYS = False
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 64))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+    PASSWORD_HASH_START_METHOD = os.getenv('PASSWORD_HASH_START_METHOD', 'forkserver')
+    WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 4))
+    WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    CART_WRITE_WINDOW = float(os.getenv('CART_WRITE_WINDOW', 0.5))
+    CART_WRITE_MAX_PENDING = int(os.getenv('CART_WRITE_MAX_PENDING', 10000))
+    CART_WRITE_MAX_RETRIES = int(os.getenv('CART_WRITE_MAX_RETRIES', 3))
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+    COMPRESS_MIN_RATIO = float(os.getenv('COMPRESS_MIN_RATIO', 0.9))
+    ASSET_BUILD_DIR = os.getenv('ASSET_BUILD_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build'))
+    REFERENCE_CACHE_TTL = int(os.getenv('REFERENCE_CACHE_TTL', 300))
+    TELEGRAM_USER_CACHE_TTL = int(os.getenv('TELEGRAM_USER_CACHE_TTL', 60))
+    TELEGRAM_USER_CACHE_MAXSIZE = int(os.getenv('TELEGRAM_USER_CACHE_MAXSIZE', 10000))
\ No newline at end of file
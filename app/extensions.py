@@ -1,5 +1,152 @@
+import threading
+import time
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
+from sqlalchemy import create_engine, event, exc, make_url
+from sqlalchemy.pool import NullPool, QueuePool
+from .cache import TTLCache
+from .cart_buffer import CartWriteBuffer
+from .compression import ResponseCompressor
+from .config import Config
+from .hashing import PasswordHasher
+from .instrumentation import instrument_engine
+from .replicas import FlaskRoutingSession, ReplicaRouter
 
-db = SQLAlchemy()
-jwt = JWTManager()
\ No newline at end of file
+
+class PoolStats:
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds):
+        self.wait_seconds += seconds
+        if seconds > self.max_wait_seconds:
+            self.max_wait_seconds = seconds
+
+    def snapshot(self):
+        data = {
+            'connects': self.connects, 'checkouts': self.checkouts, 'checkins': self.checkins,
+            'timeouts': self.timeouts, 'wait_seconds': round(self.wait_seconds, 4),
+            'max_wait_seconds': round(self.max_wait_seconds, 4),
+        }
+        # با replicaها چند pool وجود دارد؛ وضعیت فعلی جمع همه آن‌هاست
+        pools = [e.pool for e in _engines.values() if isinstance(e.pool, QueuePool)]
+        if pools:
+            data.update(size=sum(p.size() for p in pools), checked_out=sum(p.checkedout() for p in pools),
+                        overflow=sum(p.overflow() for p in pools))
+        return data
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - started)
+
+
+def _config_dict(config):
+    if config is None:
+        return {k: getattr(Config, k) for k in dir(Config) if k.isupper()}
+    return config
+
+
+def engine_options(config):
+    url = config['SQLALCHEMY_DATABASE_URI']
+    if url.startswith('sqlite'):
+        return {}
+    if config.get('DB_PGBOUNCER'):
+        # PgBouncer در حالت transaction: اتصال نگه داشته نمی‌شود و prepared statement ساخته نمی‌شود
+        options = {'poolclass': NullPool}
+        if '+psycopg:' in url:
+            options['connect_args'] = {'prepare_threshold': None}
+        return options
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 5),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 300),
+        'pool_pre_ping': True,
+    }
+
+
+_engines = {}
+_async_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _observe(engine, config):
+    event.listen(engine, 'connect', lambda *a: setattr(pool_stats, 'connects', pool_stats.connects + 1))
+    event.listen(engine, 'checkout', lambda *a: setattr(pool_stats, 'checkouts', pool_stats.checkouts + 1))
+    event.listen(engine, 'checkin', lambda *a: setattr(pool_stats, 'checkins', pool_stats.checkins + 1))
+    instrument_engine(engine, config.get('SQL_SLOW_QUERY_MS', 200))
+
+
+def get_engine(config=None):
+    # یک engine برای هر پروسه؛ Flask-SQLAlchemy و ربات هر دو از همین استفاده می‌کنند
+    config = _config_dict(config)
+    url = config['SQLALCHEMY_DATABASE_URI']
+    with _engines_lock:
+        engine = _engines.get(url)
+        if engine is None:
+            engine = create_engine(url, **engine_options(config))
+            _observe(engine, config)
+            _engines[url] = engine
+    return engine
+
+
+def async_database_url(config):
+    # همان دیتابیس با درایور async: psycopg (نسخه ۳) برای Postgres و aiosqlite برای SQLite
+    if config.get('ASYNC_DATABASE_URL'):
+        return config['ASYNC_DATABASE_URL']
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    driver = {'postgresql': 'postgresql+psycopg', 'sqlite': 'sqlite+aiosqlite'}.get(url.get_backend_name())
+    return url.set(drivername=driver).render_as_string(hide_password=False) if driver else str(url)
+
+
+def get_async_engine(config=None):
+    # pool مستقل از engine همگام؛ هر اتصال آن بین هزاران درخواست هم‌زمان تقسیم می‌شود
+    from sqlalchemy.ext.asyncio import create_async_engine
+    config = _config_dict(config)
+    url = async_database_url(config)
+    with _engines_lock:
+        engine = _async_engines.get(url)
+        if engine is None:
+            options = engine_options(config)
+            if options.get('poolclass') is InstrumentedQueuePool:
+                del options['poolclass']
+                options.update(pool_size=config.get('ASYNC_DB_POOL_SIZE', 20),
+                               max_overflow=config.get('ASYNC_DB_MAX_OVERFLOW', 10))
+            engine = create_async_engine(url, **options)
+            _observe(engine.sync_engine, config)
+            _async_engines[url] = engine
+    return engine
+
+
+class SharedEngineSQLAlchemy(SQLAlchemy):
+    def _make_engine(self, bind_key, options, app):
+        if bind_key is None:
+            return get_engine(app.config)
+        return super()._make_engine(bind_key, options, app)
+
+
+db = SharedEngineSQLAlchemy(session_options={'class_': FlaskRoutingSession})
+jwt = JWTManager()
+password_hasher = PasswordHasher()
+reference_cache = TTLCache('reference', ttl=300, config_prefix='REFERENCE_CACHE')
+cart_buffer = CartWriteBuffer()
+replicas = ReplicaRouter()
+compressor = ResponseCompressor()
+telegram_user_cache = TTLCache('telegram_users', ttl=60, maxsize=10000, config_prefix='TELEGRAM_USER_CACHE')
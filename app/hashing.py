@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt', workers=2, max_pending=64, timeout=10, start_method='forkserver'):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.start_method = start_method
+        self._executor = None
+        self._executor_pid = None
+        self._prefix = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self.pending = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.wait_seconds = 0.0
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', self.max_pending)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self.start_method = app.config.get('PASSWORD_HASH_START_METHOD', self.start_method)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._prefix = None
+
+    def _context(self):
+        # pool به صورت lazy داخل پروسه‌ای ساخته می‌شود که thread دارد (صف webhook، بافر سبد، gthread)؛
+        # fork در این حالت ممکن است قفلی را که thread دیگری گرفته در فرزند قفل‌شده باقی بگذارد
+        method = self.start_method
+        if method not in multiprocessing.get_all_start_methods():
+            method = 'spawn'
+        ctx = multiprocessing.get_context(method)
+        if method == 'forkserver':
+            ctx.set_forkserver_preload(['werkzeug.security'])
+        return ctx
+
+    def _pool(self):
+        # هر worker گانیکورن بعد از fork باید pool مخصوص خودش را بسازد
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context())
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            self.rejected += 1
+            raise HashingBusy()
+        started = time.perf_counter()
+        with self._lock:
+            self.pending += 1
+            self.submitted += 1
+        try:
+            return self._pool().submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HashingBusy()
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.wait_seconds += time.perf_counter() - started
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def needs_rehash(self, pwhash):
+        if self._prefix is None:
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._prefix
+
+    def verify(self, pwhash, password):
+        # خروجی: (معتبر بودن، هش جدید در صورت تغییر الگوریتم یا هزینه)
+        if not self._run(check_password_hash, pwhash, password):
+            return False, None
+        if self.needs_rehash(pwhash):
+            self.rehashed += 1
+            return True, self.hash(password)
+        return True, None
+
+    def stats(self):
+        return {
+            'pending': self.pending, 'max_pending': self.max_pending, 'workers': self.workers,
+            'submitted': self.submitted, 'rejected': self.rejected, 'rehashed': self.rehashed,
+            'wait_seconds': round(self.wait_seconds, 3),
+        }
@@ -0,0 +1,148 @@
+import contextvars
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_THIS_FILE = os.path.abspath(__file__)
+_current = contextvars.ContextVar('sql_trace', default=None)
+_project_files = {}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class SQLTrace:
+    __slots__ = ('name', 'count', 'total', 'slowest', 'budget', 'keep')
+
+    def __init__(self, name, budget=None, keep=3):
+        self.name = name
+        self.budget = budget
+        self.keep = keep
+        self.count = 0
+        self.total = 0.0
+        self.slowest = []
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.total += duration
+        if len(self.slowest) < self.keep or duration > self.slowest[-1][0]:
+            self.slowest.append((duration, ' '.join(statement.split())[:200], call_site()))
+            self.slowest.sort(key=lambda x: x[0], reverse=True)
+            del self.slowest[self.keep:]
+
+    def over_budget(self):
+        return self.budget is not None and self.count > self.budget
+
+    def summary(self):
+        slowest = '; '.join(f'{d * 1000:.1f}ms {site} {sql}' for d, sql, site in self.slowest)
+        return f'{self.name}: {self.count} queries, {self.total * 1000:.1f}ms [{slowest}]'
+
+
+def _project_path(filename):
+    # نتیجه برای هر فایل یک بار حساب و نگه داشته می‌شود؛ '' یعنی frame بیرون از پروژه است
+    rel = _project_files.get(filename)
+    if rel is None:
+        path = os.path.abspath(filename)
+        inside = path.startswith(_PROJECT_ROOT) and path != _THIS_FILE and 'site-packages' not in path
+        rel = _project_files[filename] = os.path.relpath(path, _PROJECT_ROOT) if inside else ''
+    return rel
+
+
+def call_site(depth=2):
+    # نزدیک‌ترین frameهای داخل پروژه (بیرون از SQLAlchemy و همین فایل) که کوئری را اجرا کرده‌اند؛
+    # frameها با sys._getframe پیموده می‌شوند و با پیدا شدن depth frame کار تمام است (بدون ساختن کل stack)
+    sites = []
+    frame = sys._getframe(1)
+    while frame is not None and len(sites) < depth:
+        rel = _project_path(frame.f_code.co_filename)
+        if rel:
+            sites.append(f'{rel}:{frame.f_lineno}')
+        frame = frame.f_back
+    return ' <- '.join(sites) or '?'
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def track(name, budget=None, strict=False):
+    trace = SQLTrace(name, budget)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+    if trace.over_budget():
+        if strict:
+            raise QueryBudgetExceeded(trace.summary())
+        logger.warning('Query budget %s exceeded by %s', budget, trace.summary())
+
+
+def query_budget(limit):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            trace = current_trace()
+            if trace is not None:
+                trace.budget = limit
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_engine(engine, slow_ms=200):
+    slow = slow_ms / 1000.0
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['query_start'].pop()
+        trace = _current.get()
+        if trace is not None:
+            trace.record(statement, duration)
+        if duration >= slow:
+            logger.warning('Slow query %.1fms at %s: %s', duration * 1000, call_site(), ' '.join(statement.split())[:500])
+
+    @event.listens_for(engine, 'handle_error')
+    def _failed(context):
+        conn = context.connection
+        if conn is not None and conn.info.get('query_start'):
+            conn.info['query_start'].pop()
+
+
+def init_app(app):
+    @app.before_request
+    def _start_trace():
+        g.sql_trace_token = _current.set(SQLTrace(request.endpoint or request.path,
+                                                  current_app.config.get('SQL_QUERY_BUDGET')))
+
+    @app.after_request
+    def _finish_trace(response):
+        trace = _current.get()
+        if trace is None:
+            return response
+        response.headers.add('Server-Timing', f'db;dur={trace.total * 1000:.1f};desc="{trace.count} queries"')
+        if trace.over_budget():
+            if current_app.config.get('SQL_QUERY_BUDGET_STRICT'):
+                raise QueryBudgetExceeded(trace.summary())
+            logger.warning('Query budget %s exceeded by %s', trace.budget, trace.summary())
+        return response
+
+    @app.teardown_request
+    def _reset_trace(exc):
+        token = g.pop('sql_trace_token', None)
+        if token is not None:
+            _current.reset(token)
@@ -0,0 +1,242 @@
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from flask import Response, current_app, g, request
+from .instrumentation import current_trace
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_str(labelnames, values):
+    return ','.join(f'{k}="{_escape(v)}"' for k, v in zip(labelnames, values))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values):
+        # هر ترکیب برچسب یک بار ساخته می‌شود؛ مسیر داغ فقط یک lookup در dict است
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child(_label_str(self.labelnames, values))
+        return child
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for child in list(self._children.values()):
+            lines.extend(child.expose(self.name))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('labels', 'value', '_lock')
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def expose(self, name):
+        return [f'{name}{{{self.labels}}} {self.value}' if self.labels else f'{name} {self.value}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self, labels):
+        return _CounterChild(labels)
+
+
+class _HistogramChild:
+    __slots__ = ('labels', 'buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, labels, buckets):
+        self.labels = labels
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def expose(self, name):
+        prefix = f'{self.labels},' if self.labels else ''
+        suffix = f'{{{self.labels}}}' if self.labels else ''
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{suffix} {self.sum}')
+        lines.append(f'{name}_count{suffix} {self.count}')
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self, labels):
+        return _HistogramChild(labels, self.buckets)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._callbacks = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def register_callback(self, name, documentation, kind, fn):
+        # fn لیستی از (برچسب‌ها به صورت dict، مقدار) برمی‌گرداند و فقط هنگام scrape صدا زده می‌شود
+        self._callbacks.append((name, documentation, kind, fn))
+
+    def expose(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        for name, documentation, kind, fn in self._callbacks:
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in fn():
+                label_str = _label_str(labels.keys(), labels.values())
+                lines.append(f'{name}{{{label_str}}} {value}' if label_str else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+http_requests = Counter('http_requests_total', 'HTTP requests by route, method and status.',
+                        ('blueprint', 'endpoint', 'method', 'status'))
+http_errors = Counter('http_request_errors_total', 'HTTP requests that ended with a 5xx status.',
+                      ('blueprint', 'endpoint'))
+http_latency = Histogram('http_request_duration_seconds', 'HTTP request latency.', ('blueprint', 'endpoint'))
+http_db_time = Histogram('http_request_db_seconds', 'Database time spent per HTTP request.', ('blueprint', 'endpoint'))
+bot_updates = Counter('bot_handler_total', 'Telegram handler invocations by outcome.', ('handler', 'outcome'))
+bot_latency = Histogram('bot_handler_duration_seconds', 'Telegram handler latency.', ('handler',))
+
+
+def instrument_bot(bot):
+    for handlers in (bot.message_handlers, bot.callback_query_handlers):
+        for handler in handlers:
+            handler['function'] = _timed_handler(handler['function'])
+
+
+def _timed_handler(fn):
+    name = fn.__name__
+    latency = bot_latency.labels(name)
+    ok, failed = bot_updates.labels(name, 'ok'), bot_updates.labels(name, 'error')
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            failed.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - started)
+        ok.inc()
+        return result
+    return wrapper
+
+
+def _default_collectors():
+    from .cache import registered_caches
+    from .extensions import cart_buffer, compressor, password_hasher, pool_stats, replicas
+
+    def pool():
+        return [({'stat': k}, v) for k, v in pool_stats.snapshot().items()]
+
+    def cache_requests():
+        rows = []
+        for name, cache in registered_caches().items():
+            rows.append(({'cache': name, 'result': 'hit'}, cache.hits))
+            rows.append(({'cache': name, 'result': 'miss'}, cache.misses))
+        return rows
+
+    def cache_hit_ratio():
+        return [({'cache': name}, c.hits / (c.hits + c.misses) if c.hits + c.misses else 0)
+                for name, c in registered_caches().items()]
+
+    def hasher():
+        return [({'stat': k}, v) for k, v in password_hasher.stats().items()]
+
+    REGISTRY.register_callback('db_pool', 'Connection pool counters and current state.', 'gauge', pool)
+    REGISTRY.register_callback('cache_requests_total', 'Cache lookups by result.', 'counter', cache_requests)
+    REGISTRY.register_callback('cache_hit_ratio', 'Cache hit ratio since start.', 'gauge', cache_hit_ratio)
+    REGISTRY.register_callback('password_hasher', 'Password hashing pool counters.', 'gauge', hasher)
+    REGISTRY.register_callback('db_replicas', 'Read-replica routing: replica reads, fallbacks to primary, failures.',
+                               'gauge', lambda: [({'stat': k}, v) for k, v in replicas.stats().items()])
+    REGISTRY.register_callback('http_compression', 'Response compression: bytes in/out, CPU seconds, skips by reason.',
+                               'gauge', lambda: [({'stat': k}, v) for k, v in compressor.stats().items()])
+    REGISTRY.register_callback('cart_write_buffer', 'Coalesced cart writes: adds buffered vs rows flushed.', 'gauge',
+                               lambda: [({'stat': k}, v) for k, v in cart_buffer.stats().items()])
+
+
+_defaults_registered = False
+
+
+def init_app(app):
+    global _defaults_registered
+    if not _defaults_registered:
+        _default_collectors()
+        _defaults_registered = True
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        blueprint, endpoint = request.blueprint or '', request.endpoint or 'unmatched'
+        http_requests.labels(blueprint, endpoint, request.method, response.status_code).inc()
+        if response.status_code >= 500:
+            http_errors.labels(blueprint, endpoint).inc()
+        http_latency.labels(blueprint, endpoint).observe(time.perf_counter() - started)
+        trace = current_trace()
+        if trace is not None:
+            http_db_time.labels(blueprint, endpoint).observe(trace.total)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        token = current_app.config.get('METRICS_TOKEN')
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return 'Access denied', 403
+        return Response(REGISTRY.expose(), mimetype='text/plain; version=0.0.4')
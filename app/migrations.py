@@ -0,0 +1,208 @@
+from datetime import datetime
+from sqlalchemy import exc, inspect, text
+from .reporting import rebuild as rebuild_rollups
+from .search import ensure_search_index, ensure_trigram, trigram_available
+
+# هر migration فقط از گام‌های idempotent ساخته می‌شود تا اجرای نیمه‌کاره را بتوان دوباره از سر گرفت
+
+
+class SQL:
+    def __init__(self, sql, dialects=None):
+        self.sql = sql
+        self.dialects = dialects
+
+    def apply(self, engine):
+        with engine.begin() as conn:
+            conn.execute(text(self.sql))
+
+    def __str__(self):
+        return ' '.join(self.sql.split())[:80]
+
+
+class Call:
+    def __init__(self, fn, dialects=None):
+        self.fn = fn
+        self.dialects = dialects
+
+    def apply(self, engine):
+        with engine.begin() as conn:
+            self.fn(conn)
+
+    def __str__(self):
+        return self.fn.__name__
+
+
+class AddColumn:
+    dialects = None
+
+    def __init__(self, table, column, ddl):
+        self.table = table
+        self.column = column
+        self.ddl = ddl
+
+    def apply(self, engine):
+        columns = {c['name'] for c in inspect(engine).get_columns(self.table)}
+        if self.column in columns:
+            return
+        with engine.begin() as conn:
+            if engine.dialect.name == 'postgresql':
+                # ALTER TABLE قفل انحصاری می‌خواهد؛ به جای صف‌کردن پشت تراکنش‌های طولانی، سریع شکست می‌خورد
+                conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+            conn.execute(text(f'ALTER TABLE {self.table} ADD COLUMN {self.column} {self.ddl}'))
+
+    def __str__(self):
+        return f'add column {self.table}.{self.column}'
+
+
+class CreateIndex:
+    def __init__(self, name, table, columns, unique=False, where=None, using=None, dialects=None, when=None):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.unique = unique
+        self.where = where or {}
+        self.using = using
+        self.dialects = dialects
+        self.when = when
+
+    def apply(self, engine):
+        if self.when is not None:
+            with engine.connect() as conn:
+                if not self.when(conn):
+                    return
+        dialect = engine.dialect.name
+        unique = 'UNIQUE ' if self.unique else ''
+        where = self.where.get(dialect) if isinstance(self.where, dict) else self.where
+        where = f' WHERE {where}' if where else ''
+
+        if dialect != 'postgresql':
+            with engine.begin() as conn:
+                conn.execute(text(f'CREATE {unique}INDEX IF NOT EXISTS {self.name} ON {self.table} ({self.columns}){where}'))
+            return
+
+        using = f' USING {self.using}' if self.using else ''
+        # CONCURRENTLY بیرون از تراکنش اجرا می‌شود و جدول را برای نوشتن قفل نمی‌کند
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            invalid = conn.execute(text(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"), {'name': self.name}).first()
+            if invalid:
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {self.name}'))
+            try:
+                conn.execute(text(
+                    f'CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {self.name} ON {self.table}{using} ({self.columns}){where}'))
+            except exc.DBAPIError:
+                # CONCURRENTLY ناموفق (مثلاً مقدار تکراری در ایندکس یکتا) یک ایندکس INVALID باقی می‌گذارد
+                # که روی جدول هزینه نوشتن دارد؛ پاکش می‌کنیم و خطا را بالا می‌دهیم
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {self.name}'))
+                raise
+
+    def __str__(self):
+        return f'create index {self.name}'
+
+
+class Migration:
+    def __init__(self, version, description, steps):
+        self.version = version
+        self.description = description
+        self.steps = steps
+
+
+ACTIVE = {'postgresql': 'is_active', 'sqlite': 'is_active = 1'}
+
+MIGRATIONS = [
+    Migration('0001', 'bot schema: cart table, users.telegram_id/address, orders.idempotency_key', [
+        AddColumn('users', 'telegram_id', 'BIGINT'),
+        AddColumn('users', 'address', 'VARCHAR(255)'),
+        # ثبت‌نام قدیمی ربات اتصال قبلی telegram_id را برنمی‌داشت؛ فقط جدیدترین حساب متصل می‌ماند
+        SQL("""
+            UPDATE users SET telegram_id = NULL
+            WHERE telegram_id IS NOT NULL AND user_id NOT IN (
+                SELECT MAX(user_id) FROM users WHERE telegram_id IS NOT NULL GROUP BY telegram_id
+            )
+        """),
+        CreateIndex('ix_users_telegram_id', 'users', 'telegram_id', unique=True),
+        AddColumn('orders', 'idempotency_key', 'VARCHAR(64)'),
+        CreateIndex('uq_orders_user_idempotency_key', 'orders', 'user_id, idempotency_key', unique=True),
+        SQL("""
+            CREATE TABLE IF NOT EXISTS cart (
+                user_id INTEGER NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+                product_id INTEGER NOT NULL REFERENCES product (product_id) ON DELETE CASCADE,
+                quantity INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (user_id, product_id)
+            )
+        """),
+    ]),
+    Migration('0002', 'hot-path indexes', [
+        # GET /api/orders: WHERE user_id = ? ORDER BY order_id DESC
+        CreateIndex('ix_orders_user_id_order_id', 'orders', 'user_id, order_id'),
+        # GET /api/admin/orders?status=...&from=...&to=...
+        CreateIndex('ix_orders_status_order_id', 'orders', 'status, order_id'),
+        CreateIndex('ix_orders_order_date', 'orders', 'order_date'),
+        CreateIndex('ix_order_item_product_id', 'order_item', 'product_id'),
+        CreateIndex('ix_payment_order_id', 'payment', 'order_id'),
+        # GET /api/products: active listing, optionally per category, keyset on product_id
+        CreateIndex('ix_product_active_id', 'product', 'product_id', where=ACTIVE),
+        CreateIndex('ix_product_active_category_id', 'product', 'category_id, product_id', where=ACTIVE),
+        CreateIndex('ix_product_seller_id', 'product', 'seller_id'),
+    ]),
+    Migration('0003', 'product search index', [
+        Call(ensure_trigram, dialects=['postgresql']),
+        CreateIndex('ix_product_search_trgm', 'product', "(name || ' ' || coalesce(description, '')) gin_trgm_ops",
+                    using='gin', dialects=['postgresql'], when=trigram_available),
+        Call(ensure_search_index, dialects=['sqlite']),
+    ]),
+    Migration('0004', 'sales rollups', [
+        SQL("""
+            CREATE TABLE IF NOT EXISTS sales_rollup (
+                day DATE NOT NULL,
+                product_id INTEGER NOT NULL,
+                category_id INTEGER NOT NULL,
+                seller_id INTEGER NOT NULL,
+                units INTEGER NOT NULL DEFAULT 0,
+                revenue NUMERIC(14, 2) NOT NULL DEFAULT 0,
+                orders INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, product_id)
+            )
+        """),
+        CreateIndex('ix_sales_rollup_category_day', 'sales_rollup', 'category_id, day'),
+        CreateIndex('ix_sales_rollup_seller_day', 'sales_rollup', 'seller_id, day'),
+        # ثبت سفارش قدیمی ربات order_date نمی‌گذاشت؛ تاریخ ثابت می‌شود تا لغو بعدی از همان روز کم کند
+        SQL('UPDATE orders SET order_date = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE order_date IS NULL'),
+        Call(rebuild_rollups),
+    ]),
+]
+
+
+def _ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_migrations (version VARCHAR(32) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)'))
+
+
+def applied_versions(engine):
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def migrate(engine, log=print):
+    applied = applied_versions(engine)
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            continue
+        log(f'⏳ migration {migration.version}: {migration.description}')
+        for step in migration.steps:
+            if step.dialects and engine.dialect.name not in step.dialects:
+                continue
+            log(f'   - {step}')
+            step.apply(engine)
+        with engine.begin() as conn:
+            conn.execute(text('INSERT INTO schema_migrations (version, applied_at) VALUES (:v, :t)'),
+                         {'v': migration.version, 't': datetime.utcnow()})
+    log('✅ schema is up to date.')
+
+
+def status(engine):
+    applied = applied_versions(engine)
+    return [(m.version, m.description, m.version in applied) for m in MIGRATIONS]
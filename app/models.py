@@ -24,6 +24,8 @@ class User(db.Model):
     username = db.Column(db.String(50), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), default='customer')
+    telegram_id = db.Column(db.BigInteger, unique=True, index=True)
+    address = db.Column(db.String(255))
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
@@ -54,6 +56,13 @@ class Seller(db.Model):
 
 class Product(db.Model):
     __tablename__ = 'product'
+    __table_args__ = (
+        db.Index('ix_product_active_id', 'product_id',
+                 postgresql_where=db.text('is_active'), sqlite_where=db.text('is_active = 1')),
+        db.Index('ix_product_active_category_id', 'category_id', 'product_id',
+                 postgresql_where=db.text('is_active'), sqlite_where=db.text('is_active = 1')),
+        db.Index('ix_product_seller_id', 'seller_id'),
+    )
     product_id = db.Column(db.Integer, primary_key=True)
     seller_id = db.Column(db.Integer, db.ForeignKey('seller.seller_id'), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('category.category_id'), nullable=False)
@@ -75,6 +84,12 @@ class Product(db.Model):
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        db.Index('uq_orders_user_idempotency_key', 'user_id', 'idempotency_key', unique=True),
+        db.Index('ix_orders_user_id_order_id', 'user_id', 'order_id'),
+        db.Index('ix_orders_status_order_id', 'status', 'order_id'),
+        db.Index('ix_orders_order_date', 'order_date'),
+    )
     
     order_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
@@ -82,6 +97,7 @@ class Order(db.Model):
     total_amount = db.Column(db.Numeric(12, 2), default=0)
     shipping_address = db.Column(db.String(255), nullable=False)
     status = db.Column(db.String(50), default='Pending')
+    idempotency_key = db.Column(db.String(64))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
     order_items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
@@ -94,6 +110,9 @@ class Order(db.Model):
 
 class OrderItem(db.Model):
     __tablename__ = 'order_item'
+    __table_args__ = (
+        db.Index('ix_order_item_product_id', 'product_id'),
+    )
     order_id = db.Column(db.Integer, db.ForeignKey('orders.order_id'), primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.product_id'), primary_key=True)
     quantity = db.Column(db.Integer, nullable=False)
@@ -101,6 +120,9 @@ class OrderItem(db.Model):
 
 class Payment(db.Model):
     __tablename__ = 'payment'
+    __table_args__ = (
+        db.Index('ix_payment_order_id', 'order_id'),
+    )
     payment_id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.order_id'), nullable=False)
     transaction_no = db.Column(db.String(100), unique=True, nullable=False)
@@ -114,4 +136,24 @@ class Payment(db.Model):
         return {
             'id': self.payment_id, 'order_id': self.order_id, 'transaction_no': self.transaction_no,
             'amount': float(self.amount), 'status': self.status
-        }
\ No newline at end of file
+        }
+
+class Cart(db.Model):
+    __tablename__ = 'cart'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.product_id', ondelete='CASCADE'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+
+class SalesRollup(db.Model):
+    __tablename__ = 'sales_rollup'
+    __table_args__ = (
+        db.Index('ix_sales_rollup_category_day', 'category_id', 'day'),
+        db.Index('ix_sales_rollup_seller_day', 'seller_id', 'day'),
+    )
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    category_id = db.Column(db.Integer, nullable=False)
+    seller_id = db.Column(db.Integer, nullable=False)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    orders = db.Column(db.Integer, nullable=False, default=0)
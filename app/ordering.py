@@ -0,0 +1,102 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import case, insert, select, update
+from .carts import cart_items, clear_cart
+from .models import Order, OrderItem, Product
+from .reporting import apply_order, counts, record_status_change
+
+
+class InsufficientStock(Exception):
+    def __init__(self, items):
+        self.items = items
+        names = '، '.join(str(i['name'] or i['product_id']) for i in items)
+        super().__init__(f'موجودی ناکافی: {names}')
+
+
+def merge_lines(items):
+    quantities = {}
+    for item in items:
+        pid, qty = int(item['product_id']), int(item['quantity'])
+        if qty <= 0:
+            raise ValueError(f'تعداد نامعتبر برای محصول {pid}')
+        quantities[pid] = quantities.get(pid, 0) + qty
+    if not quantities:
+        raise ValueError('سفارش بدون کالا است')
+    return quantities
+
+
+def reserve_stock(session, quantities):
+    # قفل‌ها همیشه به ترتیب product_id گرفته می‌شوند تا دو سفارش هم‌زمان بن‌بست نسازند
+    ids = sorted(quantities)
+    rows = session.execute(
+        select(Product.product_id, Product.name, Product.price, Product.stock)
+        .where(Product.product_id.in_(ids), Product.is_active.is_(True))
+        .order_by(Product.product_id)
+        .with_for_update()
+    ).all()
+    products = {r.product_id: r for r in rows}
+
+    short = [
+        {'product_id': pid, 'name': products[pid].name if pid in products else None,
+         'requested': quantities[pid], 'available': (products[pid].stock or 0) if pid in products else 0}
+        for pid in ids if pid not in products or (products[pid].stock or 0) < quantities[pid]
+    ]
+    if short:
+        raise InsufficientStock(short)
+
+    delta = case(quantities, value=Product.product_id)
+    result = session.execute(
+        update(Product)
+        .where(Product.product_id.in_(ids), Product.stock >= delta)
+        .values(stock=Product.stock - delta)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(ids):
+        # فقط وقتی رخ می‌دهد که دیتابیس FOR UPDATE را پشتیبانی نکند (مثل SQLite)
+        raise InsufficientStock([{'product_id': pid, 'name': products[pid].name, 'requested': quantities[pid],
+                                  'available': None} for pid in ids])
+    return products
+
+
+def place_order(session, user_id, items, shipping_address, status='Pending', idempotency_key=None):
+    quantities = merge_lines(items)
+    products = reserve_stock(session, quantities)
+    total = sum((products[pid].price * qty for pid, qty in quantities.items()), Decimal(0))
+
+    order = Order(user_id=user_id, shipping_address=shipping_address, status=status, total_amount=total,
+                  idempotency_key=idempotency_key)
+    session.add(order)
+    session.flush()
+
+    session.execute(insert(OrderItem), [
+        {'order_id': order.order_id, 'product_id': pid, 'quantity': qty, 'item_price': products[pid].price}
+        for pid, qty in quantities.items()
+    ])
+    if counts(status):
+        apply_order(session, order.order_id)
+    return order
+
+
+def place_order_from_cart(session, user_id, shipping_address, status='Processing', idempotency_key=None):
+    # تسویه سبد ذخیره‌شده برای وب و ربات؛ همان مسیر place_order با تعداد رفت‌وبرگشت ثابت.
+    # سبد یک بار و با قفل خوانده می‌شود و اقلام سفارش از همین فهرست رزروشده ساخته می‌شوند؛
+    # فقط همین خط‌ها پاک می‌شوند تا افزوده هم‌زمان بعد از خواندن از دست نرود
+    items = cart_items(session, user_id, lock=True)
+    if not items:
+        return None
+    order = place_order(session, user_id, items, shipping_address, status=status, idempotency_key=idempotency_key)
+    clear_cart(session, user_id, [i['product_id'] for i in items])
+    return order
+
+
+def change_status(session, order_id, old_status, new_status):
+    # UPDATE شرطی: فقط اگر وضعیت از زمان خواندن عوض نشده باشد؛ دو لغو هم‌زمان فقط یک بار rollup را کم می‌کنند
+    same = Order.status.is_(None) if old_status is None else Order.status == old_status
+    result = session.execute(
+        update(Order).where(Order.order_id == order_id, same)
+        .values(status=new_status, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False))
+    if result.rowcount != 1:
+        return False
+    record_status_change(session, order_id, old_status, new_status)
+    return True
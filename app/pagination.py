@@ -0,0 +1,60 @@
+import base64
+import json
+import re
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(value):
+    raw = json.dumps({'after': value}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    if token is None or token == '':
+        return None
+    # isdigit() ارقام یونیکد مثل '²' را هم قبول می‌کند که int() نمی‌پذیرد
+    if re.fullmatch(r'[0-9]+', token):
+        return int(token)
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        value = json.loads(base64.urlsafe_b64decode(padded))['after']
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor(token)
+    # همه کلیدهای keyset فعلی id عددی هستند
+    if type(value) is not int:
+        raise InvalidCursor(token)
+    return value
+
+
+def clamp_limit(raw, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    try:
+        limit = int(raw) if raw is not None else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def keyset_query(query, column, after, limit):
+    # یک ردیف اضافه می‌خوانیم تا بدون COUNT(*) بفهمیم صفحه بعدی وجود دارد یا نه
+    if after is not None:
+        query = query.filter(column < after)
+    return query.order_by(column.desc()).limit(limit + 1)
+
+
+def keyset_page(query, column, after, limit, key=None):
+    return split_page(keyset_query(query, column, after, limit).all(), column, limit, key)
+
+
+def split_page(rows, column, limit, key=None):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(key(last) if key else getattr(last, column.key))
+    return rows, next_cursor
@@ -0,0 +1,17 @@
+from functools import wraps
+from flask import jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from .extensions import db
+from .models import User
+
+
+def admin_required(fn):
+    # نقش از دیتابیس خوانده می‌شود نه از claim توکن، تا تغییر نقش فوراً اعمال شود
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        user = db.session.get(User, int(get_jwt_identity()))
+        if user is None or user.role != 'admin':
+            return jsonify({'error': 'این عملیات فقط برای مدیر مجاز است'}), 403
+        return fn(*args, **kwargs)
+    return wrapper
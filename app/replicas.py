@@ -0,0 +1,279 @@
+import contextvars
+import hashlib
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, request
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import TextClause
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('db_route', default=None)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'db_primary_until'
+
+# تأخیر replica بر حسب ثانیه؛ replica که همه WAL دریافتی را اعمال کرده تأخیر صفر دارد حتی اگر primary بیکار باشد
+_LAG_SQL = {
+    'postgresql': """
+        SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0
+                    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END
+    """,
+}
+
+
+def _is_read(clause):
+    if isinstance(clause, Select):
+        return clause._for_update_arg is None
+    if isinstance(clause, TextClause):
+        sql = clause.text.lstrip().upper()
+        return sql.startswith('SELECT') and 'FOR UPDATE' not in sql
+    return False
+
+
+class RouteState:
+    __slots__ = ('router', 'key', 'read', 'used', 'wrote')
+
+    def __init__(self, router, key, read):
+        self.router = router
+        self.key = key
+        self.read = read
+        self.used = None
+        self.wrote = False
+
+
+class RoutingMixin:
+    # SELECTهای داخل یک بلوک خواندنی به replica می‌روند؛ بعد از اولین نوشتن، بقیه همان session روی primary می‌ماند
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        state = _current.get()
+        if state is not None and bind is None:
+            if self._flushing or (clause is not None and not _is_read(clause)):
+                state.wrote = True
+                self.info['primary_only'] = True
+            elif state.read and clause is not None and not self.info.get('primary_only'):
+                url, engine = state.router.pick()
+                if engine is not None:
+                    state.used = url
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class RoutingSession(RoutingMixin, Session):
+    pass
+
+
+class FlaskRoutingSession(RoutingMixin, FlaskSession):
+    pass
+
+
+class ReplicaRouter:
+    def __init__(self, sticky_seconds=5, max_lag=10, check_interval=2, retry_after=30):
+        self.urls = []
+        self.sticky_seconds = sticky_seconds
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.retry_after = retry_after
+        self._config = {}
+        self._engines = {}
+        self._lag = {}
+        self._down = {}
+        self._sticky = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._next = itertools.count()
+        self.replica_reads = 0
+        self.fallbacks = 0
+        self.failures = 0
+        self.retries = 0
+
+    def init_app(self, app):
+        self._config = dict(app.config)
+        self.urls = [u.strip() for u in (app.config.get('DATABASE_REPLICA_URLS') or '').split(',') if u.strip()]
+        self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', self.sticky_seconds)
+        self.max_lag = app.config.get('REPLICA_MAX_LAG', self.max_lag)
+        self.check_interval = app.config.get('REPLICA_CHECK_INTERVAL', self.check_interval)
+        self.retry_after = app.config.get('REPLICA_RETRY_AFTER', self.retry_after)
+        if not self.urls:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.register_error_handler(OperationalError, self._retry_on_primary)
+
+    @property
+    def enabled(self):
+        return bool(self.urls)
+
+    def _engine(self, url):
+        from .extensions import get_engine
+        engine = self._engines.get(url)
+        if engine is None:
+            engine = self._engines[url] = get_engine({**self._config, 'SQLALCHEMY_DATABASE_URI': url})
+
+            @event.listens_for(engine, 'handle_error')
+            def _disconnected(context):
+                if context.is_disconnect:
+                    self.mark_down(url)
+        return engine
+
+    def mark_down(self, url):
+        self._down[url] = time.monotonic() + self.retry_after
+        self.failures += 1
+        logger.warning('Replica %s unavailable; reads go to primary for %ss', url.split('@')[-1], self.retry_after)
+
+    def _ensure_started(self):
+        # probe تأخیر در thread پس‌زمینه اجرا می‌شود؛ pick() فقط آخرین نتیجه را می‌خواند و هیچ درخواستی
+        # منتظر اتصال به replica کند یا قطع نمی‌ماند. thread بعد از fork در پروسه جدید دوباره ساخته می‌شود
+        if self._pid == os.getpid() or not self.urls:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name='replica-lag-probe', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.check_interval)
+
+    def refresh(self):
+        for url in self.urls:
+            if self._down.get(url, 0) <= time.monotonic():
+                self._probe(url)
+
+    def _probe(self, url):
+        engine = self._engine(url)
+        try:
+            with engine.connect() as conn:
+                lag = float(conn.execute(text(_LAG_SQL.get(engine.dialect.name, 'SELECT 0'))).scalar() or 0)
+        except Exception:
+            self._lag.pop(url, None)
+            self.mark_down(url)
+            return
+        self._lag[url] = (time.monotonic(), lag)
+        if lag > self.max_lag:
+            logger.warning('Replica %s is %.1fs behind; skipping', url.split('@')[-1], lag)
+
+    def _lag_ok(self, url, now):
+        # replica که هنوز probe نشده یا probe آن چند دوره عقب مانده (مثلاً اتصالش گیر کرده) استفاده نمی‌شود
+        checked, lag = self._lag.get(url, (None, 0.0))
+        return checked is not None and now - checked <= self.check_interval * 3 and lag <= self.max_lag
+
+    def pick(self):
+        self._ensure_started()
+        now = time.monotonic()
+        healthy = [u for u in self.urls if self._down.get(u, 0) <= now]
+        start = next(self._next)
+        for i in range(len(healthy)):
+            url = healthy[(start + i) % len(healthy)]
+            if self._lag_ok(url, now):
+                self.replica_reads += 1
+                return url, self._engine(url)
+        self.fallbacks += 1
+        return None, None
+
+    def mark_write(self, key):
+        if key is None or not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._sticky[key] = now + self.sticky_seconds
+            if len(self._sticky) > 10000:
+                self._sticky = {k: v for k, v in self._sticky.items() if v > now}
+
+    def use_primary(self):
+        # خواندن‌های بعدی این بلوک به primary می‌روند؛ برای وقتی که باید نوشته‌ای خارج از session
+        # (مثل flush بافر سبد) را ببینند که replica شاید هنوز دریافت نکرده باشد
+        state = _current.get()
+        if state is not None:
+            state.read = False
+
+    def written(self):
+        # نوشتنی که از session نمی‌گذرد (مثل بافر سبد) هم باید کاربر را به primary بچسباند
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+            state.read = False
+
+    def is_sticky(self, key):
+        return key is not None and self._sticky.get(key, 0) > time.monotonic()
+
+    @contextmanager
+    def routing(self, key=None, read=False):
+        # نوشتن داخل بلوک، key را برای sticky_seconds به primary می‌چسباند تا کاربر نوشته خودش را ببیند
+        state = RouteState(self, key, read and self.enabled and not self.is_sticky(key))
+        token = _current.set(state)
+        try:
+            yield state
+        finally:
+            _current.reset(token)
+            if state.wrote:
+                self.mark_write(key)
+
+    def read_only(self, fn):
+        # برای هندلرهای ربات که فقط می‌خوانند؛ key از بلوک routing بیرونی (run.process_updates) گرفته می‌شود
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            outer = _current.get()
+            with self.routing(outer.key if outer else None, read=True):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def _request_key(self):
+        auth = request.headers.get('Authorization')
+        return 'web:' + hashlib.sha1(auth.encode()).hexdigest() if auth else None
+
+    def _before_request(self):
+        key = self._request_key()
+        read = request.method in SAFE_METHODS
+        try:
+            if float(request.cookies.get(STICKY_COOKIE, 0)) > time.time():
+                read = False
+        except ValueError:
+            pass
+        state = RouteState(self, key, read and not self.is_sticky(key))
+        g.db_route_token = _current.set(state)
+
+    def _after_request(self, response):
+        state = _current.get()
+        if state is not None and (state.wrote or (request.method not in SAFE_METHODS and response.status_code < 400)):
+            self.mark_write(state.key)
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + self.sticky_seconds:.0f}',
+                                max_age=int(self.sticky_seconds) or 1, httponly=True, samesite='Lax')
+        return response
+
+    def _teardown_request(self, exc):
+        token = g.pop('db_route_token', None)
+        if token is not None:
+            _current.reset(token)
+
+    def _retry_on_primary(self, error):
+        # خطای replica در درخواست خواندنی: replica کنار گذاشته می‌شود و همان view یک بار روی primary اجرا می‌شود
+        state = _current.get()
+        if state is None or state.used is None:
+            raise error
+        self.mark_down(state.used)
+        self.retries += 1
+        current_app.extensions['sqlalchemy'].session.rollback()
+        state.read, state.used = False, None
+        return current_app.ensure_sync(current_app.view_functions[request.endpoint])(**request.view_args)
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'replicas': len(self.urls), 'healthy': sum(1 for u in self.urls if self._down.get(u, 0) <= now),
+            'replica_reads': self.replica_reads, 'fallbacks': self.fallbacks, 'failures': self.failures,
+            'retries': self.retries, 'sticky_keys': sum(1 for v in self._sticky.values() if v > now),
+            'max_lag_seconds': max((lag for _, lag in self._lag.values()), default=0.0),
+        }
@@ -0,0 +1,102 @@
+from sqlalchemy import func, select, text
+from .models import Category, Product, SalesRollup, Seller
+
+# sales_rollup برای هر (روز، محصول) تعداد، مبلغ و تعداد سفارش را نگه می‌دارد.
+# هر سفارش غیرلغوشده یک بار با علامت + اضافه می‌شود؛ لغو همان ردیف‌ها را با علامت - برمی‌گرداند.
+
+CANCELLED = 'Cancelled'
+
+_ROLLUP_SQL = """
+    INSERT INTO sales_rollup (day, product_id, category_id, seller_id, units, revenue, orders)
+    SELECT {day}, oi.product_id, p.category_id, p.seller_id,
+           :sign * SUM(oi.quantity), :sign * SUM(oi.quantity * oi.item_price), :sign * COUNT(DISTINCT oi.order_id)
+    FROM order_item oi
+    JOIN orders o ON o.order_id = oi.order_id
+    JOIN product p ON p.product_id = oi.product_id
+    WHERE {where}
+    GROUP BY {day}, oi.product_id, p.category_id, p.seller_id
+"""
+
+_UPSERT = """
+    ON CONFLICT (day, product_id) DO UPDATE SET
+        units = sales_rollup.units + excluded.units,
+        revenue = sales_rollup.revenue + excluded.revenue,
+        orders = sales_rollup.orders + excluded.orders
+"""
+
+
+# سفارش‌های قدیمی ربات با SQL خام و بدون order_date ثبت شده‌اند؛ day جزو کلید اصلی است و NULL نمی‌پذیرد
+_ORDER_DAY = 'COALESCE(o.order_date, o.created_at, CURRENT_TIMESTAMP)'
+
+
+def _day(session):
+    # session یا connection (مهاجرت‌ها connection می‌دهند)
+    dialect = session.dialect if hasattr(session, 'dialect') else session.get_bind().dialect
+    return f'CAST({_ORDER_DAY} AS DATE)' if dialect.name == 'postgresql' else f'date({_ORDER_DAY})'
+
+
+def counts(status):
+    return status != CANCELLED
+
+
+def apply_order(session, order_id, sign=1):
+    sql = _ROLLUP_SQL.format(day=_day(session), where='o.order_id = :oid') + _UPSERT
+    session.execute(text(sql), {'oid': order_id, 'sign': sign})
+
+
+def record_status_change(session, order_id, old_status, new_status):
+    # فقط ورود به Cancelled یا خروج از آن روی گزارش‌ها اثر دارد
+    sign = int(counts(new_status)) - int(counts(old_status))
+    if sign:
+        apply_order(session, order_id, sign)
+
+
+def rebuild(session):
+    session.execute(text('DELETE FROM sales_rollup'))
+    where = f"COALESCE(o.status, '') <> '{CANCELLED}'"
+    result = session.execute(text(_ROLLUP_SQL.format(day=_day(session), where=where)), {'sign': 1})
+    return result.rowcount
+
+
+def _window(query, date_from, date_to):
+    if date_from: query = query.where(SalesRollup.day >= date_from)
+    if date_to: query = query.where(SalesRollup.day <= date_to)
+    return query
+
+
+def _totals():
+    return func.sum(SalesRollup.units).label('units'), func.sum(SalesRollup.revenue).label('revenue')
+
+
+def revenue_by(session, group, date_from=None, date_to=None):
+    if group == 'day':
+        query = select(SalesRollup.day.label('key'), SalesRollup.day.label('name'), *_totals()) \
+            .group_by(SalesRollup.day).order_by(SalesRollup.day)
+    elif group == 'category':
+        query = select(SalesRollup.category_id.label('key'), Category.category_name.label('name'), *_totals()) \
+            .outerjoin(Category, Category.category_id == SalesRollup.category_id) \
+            .group_by(SalesRollup.category_id, Category.category_name).order_by(func.sum(SalesRollup.revenue).desc())
+    elif group == 'seller':
+        query = select(SalesRollup.seller_id.label('key'), Seller.store_name.label('name'), *_totals()) \
+            .outerjoin(Seller, Seller.seller_id == SalesRollup.seller_id) \
+            .group_by(SalesRollup.seller_id, Seller.store_name).order_by(func.sum(SalesRollup.revenue).desc())
+    else:
+        raise ValueError(group)
+    rows = session.execute(_window(query, date_from, date_to)).all()
+    return [{
+        'key': r.key.isoformat() if group == 'day' else r.key, 'name': r.name.isoformat() if group == 'day' else r.name,
+        'units': int(r.units or 0), 'revenue': float(r.revenue or 0),
+    } for r in rows]
+
+
+def top_products(session, date_from=None, date_to=None, limit=10, by='units'):
+    order = func.sum(SalesRollup.revenue if by == 'revenue' else SalesRollup.units).desc()
+    query = select(SalesRollup.product_id, *_totals(), func.sum(SalesRollup.orders).label('orders')) \
+        .group_by(SalesRollup.product_id).having(func.sum(SalesRollup.units) > 0).order_by(order).limit(limit)
+    top = _window(query, date_from, date_to).subquery()
+    rows = session.execute(
+        select(top, Product.name).outerjoin(Product, Product.product_id == top.c.product_id)
+        .order_by(top.c.revenue.desc() if by == 'revenue' else top.c.units.desc())
+    ).all()
+    return [{'product_id': r.product_id, 'name': r.name, 'units': int(r.units), 'revenue': float(r.revenue),
+             'orders': int(r.orders)} for r in rows]
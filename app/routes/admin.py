@@ -1,27 +1,147 @@
-from flask import Blueprint, jsonify
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required
-from ..models import Order, Payment
+from sqlalchemy import case, func
+from ..bulk import FORMATS, ImportFormatError, detect_format, export_products, import_products
+from ..extensions import db
+from ..models import Order, Payment, User
+from ..pagination import InvalidCursor, clamp_limit, decode_cursor, keyset_page
+from ..permissions import admin_required
+from ..reporting import revenue_by, top_products
+from ..serializers import ORDER, PAYMENT
+from ..streaming import BATCH_SIZE, stream_json, wants_stream
 
 bp = Blueprint('admin', __name__)
 
+def _parse_date(raw, end=False):
+    value = datetime.fromisoformat(raw)
+    if end and len(raw) == 10:
+        value += timedelta(days=1)
+    return value
+
+def _order_row(o):
+    # ستون‌های اول ردیف همان ORDER هستند (order_date خالی سفارش‌های قدیمی ربات هم همان‌جا مدیریت می‌شود)
+    row = ORDER.row(o)
+    row['user_full_name'] = f"{o.first_name} {o.last_name}" if o.first_name is not None else "کاربر ناشناس"
+    return row
+
+def _order_filters(args):
+    date_from = _parse_date(args['from']) if args.get('from') else None
+    date_to = _parse_date(args['to'], end=True) if args.get('to') else None
+    user_id = int(args['user_id']) if args.get('user_id') else None
+    filters = []
+    if args.get('status'): filters.append(Order.status == args['status'])
+    if user_id: filters.append(Order.user_id == user_id)
+    if date_from: filters.append(Order.order_date >= date_from)
+    if date_to: filters.append(Order.order_date < date_to)
+    return filters
+
 @bp.route('/admin/orders', methods=['GET'])
-@jwt_required()
+@admin_required
 def get_all_orders_admin():
-    orders = Order.query.order_by(Order.order_id.desc()).all()
-    
-    result = []
-    for o in orders:
-        data = o.to_dict()
-        if o.user:
-            data['user_full_name'] = f"{o.user.first_name} {o.user.last_name}"
-        else:
-            data['user_full_name'] = "کاربر ناشناس"
-        result.append(data)
-
-    return jsonify(result)
+    args = request.args
+    limit = clamp_limit(args.get('limit'))
+    try:
+        after = decode_cursor(args.get('after'))
+        filters = _order_filters(args)
+    except (InvalidCursor, ValueError):
+        return jsonify({'error': 'پارامترهای فیلتر نامعتبر هستند'}), 400
+
+    query = db.session.query(*ORDER.columns, User.first_name, User.last_name) \
+        .outerjoin(User, Order.user_id == User.user_id).filter(*filters)
+
+    stream = wants_stream()
+    if stream:
+        # خروجی کامل با همان فیلترها، بدون صفحه‌بندی
+        if after is not None: query = query.filter(Order.order_id < after)
+        rows = query.order_by(Order.order_id.desc()).yield_per(BATCH_SIZE)
+        return stream_json((_order_row(o) for o in rows), stream)
+
+    rows, next_cursor = keyset_page(query, Order.order_id, after, limit)
+    return jsonify({'orders': [_order_row(o) for o in rows], 'next_cursor': next_cursor})
+
+@bp.route('/admin/orders/stats', methods=['GET'])
+@admin_required
+def get_orders_stats_admin():
+    # آمار داشبورد روی همه سفارش‌ها (با همان فیلترها)، نه فقط صفحه‌های بارگذاری‌شده در مرورگر
+    try:
+        filters = _order_filters(request.args)
+    except ValueError:
+        return jsonify({'error': 'پارامترهای فیلتر نامعتبر هستند'}), 400
+
+    total, pending, sales = db.session.query(
+        func.count(Order.order_id),
+        func.count(case((Order.status.in_(('Processing', 'Pending')), 1))),
+        func.coalesce(func.sum(case((func.coalesce(Order.status, '') != 'Cancelled', Order.total_amount))), 0),
+    ).filter(*filters).one()
+    return jsonify({'total_orders': total, 'pending_orders': pending, 'total_sales': float(sales)})
 
 @bp.route('/payments', methods=['GET'])
 @jwt_required()
 def get_all_payments():
-    payments = Payment.query.order_by(Payment.payment_id.desc()).all()
-    return jsonify([p.to_dict() for p in payments])
\ No newline at end of file
+    stream = wants_stream()
+    if stream:
+        rows = PAYMENT.query(db.session).order_by(Payment.payment_id.desc()).yield_per(BATCH_SIZE)
+        return stream_json((PAYMENT.row(p) for p in rows), stream)
+
+    return jsonify(PAYMENT.rows(PAYMENT.query(db.session).order_by(Payment.payment_id.desc())))
+
+@bp.route('/admin/products/import', methods=['POST'])
+@admin_required
+def import_products_admin():
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, fmt = upload.stream, detect_format(upload.filename, upload.mimetype)
+    else:
+        stream, fmt = request.stream, detect_format(content_type=request.mimetype)
+    fmt = request.args.get('format', fmt)
+    if fmt not in FORMATS:
+        return jsonify({'error': 'فرمت فایل باید csv یا jsonl باشد'}), 400
+
+    try:
+        result = import_products(db.engine, stream, fmt)
+    except ImportFormatError as e:
+        # تراکنش ورود با engine.begin() برگشت خورده؛ خطای دیتابیس به صورت 500 بالا می‌رود
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result.to_dict()), 200
+
+@bp.route('/admin/products/export', methods=['GET'])
+@admin_required
+def export_products_admin():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({'error': 'فرمت فایل باید csv یا jsonl باشد'}), 400
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(export_products(db.engine, fmt)), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=products.{fmt}'})
+
+def _report_window():
+    args = request.args
+    date_from = _parse_date(args['from']).date() if args.get('from') else None
+    date_to = _parse_date(args['to']).date() if args.get('to') else None
+    return date_from, date_to
+
+@bp.route('/admin/reports/revenue', methods=['GET'])
+@admin_required
+def revenue_report():
+    group = request.args.get('group', 'day')
+    if group not in ('day', 'category', 'seller'):
+        return jsonify({'error': 'group باید day، category یا seller باشد'}), 400
+    try:
+        date_from, date_to = _report_window()
+    except ValueError:
+        return jsonify({'error': 'بازه تاریخ نامعتبر است'}), 400
+    return jsonify(revenue_by(db.session, group, date_from, date_to))
+
+@bp.route('/admin/reports/top-products', methods=['GET'])
+@admin_required
+def top_products_report():
+    by = request.args.get('by', 'units')
+    if by not in ('units', 'revenue'):
+        return jsonify({'error': 'by باید units یا revenue باشد'}), 400
+    try:
+        date_from, date_to = _report_window()
+        limit = clamp_limit(request.args.get('limit'), default=10)
+    except ValueError:
+        return jsonify({'error': 'پارامترهای گزارش نامعتبر هستند'}), 400
+    return jsonify(top_products(db.session, date_from, date_to, limit=limit, by=by))
@@ -2,8 +2,8 @@ import sys
 import traceback
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
-from ..extensions import db
+from ..extensions import db, password_hasher, telegram_user_cache
+from ..hashing import HashingBusy
 from ..models import User
 
 bp = Blueprint('auth', __name__)
@@ -37,7 +37,7 @@ def register():
             phone=phone,
             email=email, 
             role='customer',
-            password=generate_password_hash(password)
+            password=password_hasher.hash(password)
         )
         
         db.session.add(new_user)
@@ -45,6 +45,9 @@ def register():
         
         return jsonify({'message': 'ثبت نام با موفقیت انجام شد'}), 201
 
+    except HashingBusy:
+        db.session.rollback()
+        return jsonify({'error': 'سرور مشغول است، لطفاً دوباره تلاش کنید'}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'خطای دیتابیس: {str(e)}'}), 500
@@ -58,11 +61,18 @@ def login():
         
         user = User.query.filter_by(username=username).first()
         
-        if user and check_password_hash(user.password, password):
-            token = create_access_token(identity=str(user.user_id), additional_claims={'role': user.role})
-            return jsonify({'access_token': token, 'user': user.to_dict()})
+        if user:
+            is_valid, new_hash = password_hasher.verify(user.password, password)
+            if is_valid:
+                if new_hash:
+                    user.password = new_hash
+                    db.session.commit()
+                token = create_access_token(identity=str(user.user_id), additional_claims={'role': user.role})
+                return jsonify({'access_token': token, 'user': user.to_dict()})
             
         return jsonify({'error': 'نام کاربری یا رمز عبور اشتباه است'}), 401
+    except HashingBusy:
+        return jsonify({'error': 'سرور مشغول است، لطفاً دوباره تلاش کنید'}), 503
     except Exception as e:
         return jsonify({'error': 'مشکل در ورود'}), 500
 
@@ -80,6 +90,7 @@ def update_profile():
         if 'email' in data: user.email = data['email']
         
         db.session.commit()
+        if user.telegram_id: telegram_user_cache.invalidate(user.telegram_id)
         return jsonify({'message': 'پروفایل بروزرسانی شد', 'user': user.to_dict()})
     except Exception as e:
         db.session.rollback()
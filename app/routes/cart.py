@@ -0,0 +1,44 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..carts import apply_ops, cart_summary, clear_cart
+from ..extensions import cart_buffer, db, replicas
+
+bp = Blueprint('cart', __name__)
+
+@bp.route('/cart', methods=['GET'])
+@jwt_required()
+def get_cart():
+    uid = int(get_jwt_identity())
+    cart_buffer.flush(uid)
+    # flush روی primary نوشته؛ replica عقب‌مانده سبد را بدون آخرین افزوده‌ها نشان می‌دهد
+    replicas.use_primary()
+    return jsonify(cart_summary(db.session, uid))
+
+@bp.route('/cart', methods=['PATCH', 'POST'])
+@jwt_required()
+def update_cart():
+    # بدنه: {"ops": [{"op": "set|increment|remove", "product_id": 1, "quantity": 2}, ...]}
+    uid = int(get_jwt_identity())
+    d = request.get_json() or {}
+    ops = d.get('ops')
+    if not isinstance(ops, list) or not ops:
+        return jsonify({'error': 'لیست عملیات سبد خرید الزامی است'}), 400
+    if len(ops) > 200:
+        return jsonify({'error': 'تعداد عملیات در هر درخواست حداکثر ۲۰۰ است'}), 400
+    try:
+        cart_buffer.flush(uid)
+        apply_ops(db.session, uid, ops)
+        db.session.commit()
+    except (KeyError, TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e) if isinstance(e, ValueError) else 'عملیات سبد خرید نامعتبر است'}), 400
+    return jsonify(cart_summary(db.session, uid))
+
+@bp.route('/cart', methods=['DELETE'])
+@jwt_required()
+def delete_cart():
+    uid = int(get_jwt_identity())
+    cart_buffer.discard(uid)
+    clear_cart(db.session, uid)
+    db.session.commit()
+    return jsonify(cart_summary(db.session, uid))
@@ -1,60 +1,116 @@
+import uuid
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..extensions import db
-from ..models import Order, OrderItem, Product, Payment
+from sqlalchemy.exc import IntegrityError
+from ..extensions import cart_buffer, db
+from ..models import Order, Payment
+from ..ordering import InsufficientStock, change_status, place_order, place_order_from_cart
+from ..permissions import admin_required
+from ..serializers import ORDER
 from decimal import Decimal
 
 bp = Blueprint('orders', __name__)
 
+STATUS_CONFLICT = 'وضعیت سفارش هم‌زمان تغییر کرد؛ لطفاً دوباره تلاش کنید'
+
 @bp.route('/orders', methods=['GET', 'POST'])
 @jwt_required()
 def handle_orders():
     uid = int(get_jwt_identity())
     
     if request.method == 'GET':
-        orders = Order.query.filter_by(user_id=uid).order_by(Order.order_id.desc()).all()
-        return jsonify([o.to_dict() for o in orders])
+        orders = ORDER.query(db.session).filter(Order.user_id == uid).order_by(Order.order_id.desc())
+        return jsonify(ORDER.rows(orders))
     
     if request.method == 'POST':
         d = request.get_json()
         try:
-            order = Order(user_id=uid, shipping_address=d.get('shipping_address', '-'), status='Pending')
-            db.session.add(order)
-            db.session.flush()
-            
-            total_calc = 0
-            for item in d['items']:
-                p = Product.query.with_for_update().get(item['product_id'])
-                if not p or p.stock < item['quantity']: 
-                    raise Exception(f'موجودی ناکافی: {p.name}')
-                
-                p.stock -= item['quantity']
-                db.session.add(OrderItem(order_id=order.order_id, product_id=p.product_id, quantity=item['quantity'], item_price=p.price))
-                total_calc += p.price * item['quantity']
-            
-            order.total_amount = total_calc 
+            order = place_order(db.session, uid, d['items'], d.get('shipping_address', '-'))
+            order_id, total = order.order_id, order.total_amount
             db.session.commit()
-            return jsonify({'msg': 'OK', 'order_id': order.order_id, 'total_amount': float(order.total_amount)}), 201
+            return jsonify({'msg': 'OK', 'order_id': order_id, 'total_amount': float(total)}), 201
+        except InsufficientStock as e:
+            db.session.rollback()
+            return jsonify({'error': str(e), 'items': e.items}), 400
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 400
 
-@bp.route('/orders/<int:order_id>/status', methods=['PUT'])
+def _checkout_result(order, payment):
+    return {'msg': 'OK', 'order_id': order.order_id, 'total_amount': float(order.total_amount),
+            'status': order.status, 'payment': payment.to_dict() if payment else None}
+
+def _replayed_checkout(uid, key):
+    order = Order.query.filter_by(user_id=uid, idempotency_key=key).first()
+    if order:
+        return _checkout_result(order, Payment.query.filter_by(order_id=order.order_id).first())
+    return None
+
+@bp.route('/checkout', methods=['POST'])
 @jwt_required()
+def checkout():
+    uid = int(get_jwt_identity())
+    d = request.get_json() or {}
+    key = request.headers.get('Idempotency-Key') or d.get('idempotency_key')
+    if key and len(key) > 64:
+        return jsonify({'error': 'کلید Idempotency نامعتبر است'}), 400
+
+    if key:
+        replay = _replayed_checkout(uid, key)
+        if replay:
+            return jsonify(replay), 200
+
+    try:
+        # بدون items، سبد ذخیره‌شده در سرور (همان سبد ربات) نهایی می‌شود
+        if d.get('items'):
+            order = place_order(db.session, uid, d['items'], d.get('shipping_address', '-'),
+                                status='Processing', idempotency_key=key)
+        else:
+            cart_buffer.flush(uid)
+            order = place_order_from_cart(db.session, uid, d.get('shipping_address', '-'), idempotency_key=key)
+            if order is None:
+                return jsonify({'error': 'سبد خرید خالی است'}), 400
+        payment = Payment(
+            order_id=order.order_id, transaction_no=d.get('transaction_no') or f'TRX-{uuid.uuid4().hex}',
+            amount=order.total_amount, method=d.get('method', 'Shaparak'), status='Successful'
+        )
+        db.session.add(payment)
+        db.session.flush()
+        result = _checkout_result(order, payment)
+        db.session.commit()
+        return jsonify(result), 201
+    except InsufficientStock as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'items': e.items}), 400
+    except IntegrityError as e:
+        # درخواست تکراری هم‌زمان با همان کلید: سفارشِ ثبت‌شده قبلی برگردانده می‌شود
+        db.session.rollback()
+        replay = _replayed_checkout(uid, key) if key else None
+        if replay:
+            return jsonify(replay), 200
+        return jsonify({'error': str(e.orig)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+@bp.route('/orders/<int:order_id>/status', methods=['PUT'])
+@admin_required
 def update_order_status(order_id):
     d = request.get_json()
-    order = Order.query.get(order_id)
-    if order:
-        order.status = d.get('status')
-        db.session.commit()
-        return jsonify({'msg': 'Updated'})
-    return jsonify({'error': 'Not found'}), 404
+    order = db.session.get(Order, order_id)
+    if not order:
+        return jsonify({'error': 'Not found'}), 404
+    if not change_status(db.session, order.order_id, order.status, d.get('status')):
+        db.session.rollback()
+        return jsonify({'error': STATUS_CONFLICT}), 409
+    db.session.commit()
+    return jsonify({'msg': 'Updated'})
 
 @bp.route('/orders/<int:order_id>/cancel', methods=['PUT'])
 @jwt_required()
 def cancel_my_order(order_id):
     uid = int(get_jwt_identity())
-    order = Order.query.get(order_id)
+    order = db.session.get(Order, order_id)
     
     if not order:
         return jsonify({'error': 'سفارش یافت نشد'}), 404
@@ -66,7 +122,9 @@ def cancel_my_order(order_id):
         return jsonify({'error': 'سفارش وارد مراحل ارسال شده و قابل لغو نیست'}), 400
         
     try:
-        order.status = 'Cancelled'
+        if not change_status(db.session, order.order_id, order.status, 'Cancelled'):
+            db.session.rollback()
+            return jsonify({'error': STATUS_CONFLICT}), 409
         db.session.commit()
         return jsonify({'msg': 'سفارش با موفقیت لغو شد'})
     except Exception as e:
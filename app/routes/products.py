@@ -1,15 +1,23 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from ..extensions import db
+from ..cache import cached_json, invalidate_on_write
+from ..extensions import db, reference_cache
 from ..models import Product, Category, Seller
+from ..pagination import InvalidCursor, clamp_limit, decode_cursor, keyset_page
+from ..search import MAX_RESULTS, search_products
+from ..serializers import CATEGORY, PRODUCT, SELLER
+from ..streaming import BATCH_SIZE, stream_json, wants_stream
 from decimal import Decimal
 
 bp = Blueprint('products', __name__)
 
+invalidate_on_write(reference_cache, 'categories', Category)
+invalidate_on_write(reference_cache, 'sellers', Seller)
+
 @bp.route('/categories', methods=['GET'])
+@cached_json(reference_cache, 'categories')
 def get_categories():
-    cats = Category.query.all()
-    return jsonify([c.to_dict() for c in cats])
+    return CATEGORY.rows(CATEGORY.query(db.session))
 
 @bp.route('/products', methods=['GET', 'POST'])
 def handle_products():
@@ -35,14 +43,28 @@ def handle_products():
             return jsonify({'error': str(e)}), 400
     
     search = request.args.get('search')
-    cat_id = request.args.get('category_id')
-    query = Product.query.filter_by(is_active=True)
-    
-    if search: query = query.filter(Product.name.ilike(f'%{search}%'))
-    if cat_id: query = query.filter_by(category_id=int(cat_id))
+    limit = clamp_limit(request.args.get('limit', request.args.get('per_page')))
+    try:
+        after = decode_cursor(request.args.get('after'))
+    except InvalidCursor:
+        return jsonify({'error': 'پارامتر after نامعتبر است'}), 400
+    try:
+        cat_id = int(request.args['category_id']) if request.args.get('category_id') else None
+    except ValueError:
+        return jsonify({'error': 'پارامتر category_id نامعتبر است'}), 400
+
+    if search:
+        if after is not None:
+            # نتایج جستجو بر اساس ربط مرتب می‌شوند و cursor مبتنی بر id ندارند
+            return jsonify({'error': 'پارامتر after در جستجو پشتیبانی نمی‌شود'}), 400
+        items = search_products(db.session, search, min(limit, MAX_RESULTS), cat_id, columns=PRODUCT.columns)
+        return jsonify({'products': PRODUCT.rows(items), 'next_cursor': None})
+
+    query = PRODUCT.query(db.session).filter(Product.is_active.is_(True))
+    if cat_id: query = query.filter(Product.category_id == cat_id)
     
-    p = query.order_by(Product.product_id.desc()).paginate(page=1, per_page=50, error_out=False)
-    return jsonify({'products': [x.to_dict() for x in p.items]})
+    items, next_cursor = keyset_page(query, Product.product_id, after, limit)
+    return jsonify({'products': PRODUCT.rows(items), 'next_cursor': next_cursor})
 
 @bp.route('/products/<int:id>', methods=['DELETE'])
 @jwt_required()
@@ -62,4 +84,13 @@ def delete_product(id):
 
 @bp.route('/sellers', methods=['GET'])
 def get_sellers():
-    return jsonify([s.to_dict() for s in Seller.query.all()])
\ No newline at end of file
+    stream = wants_stream()
+    if stream:
+        # مسیر جریانی از کش عبور نمی‌کند
+        rows = SELLER.query(db.session).yield_per(BATCH_SIZE)
+        return stream_json((SELLER.row(s) for s in rows), stream)
+    return _cached_sellers()
+
+@cached_json(reference_cache, 'sellers')
+def _cached_sellers():
+    return SELLER.rows(SELLER.query(db.session))
\ No newline at end of file
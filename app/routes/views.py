@@ -1,11 +1,19 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, abort
+from ..assets import asset_response, page_response
 
 bp = Blueprint('views', __name__)
 
 @bp.route('/')
 def home():
-    return render_template('index.html')
+    return page_response('home')
 
 @bp.route('/admin/login')
 def admin_login_page():
-    return render_template('admin_login.html')
\ No newline at end of file
+    return page_response('admin_login')
+
+@bp.route('/assets/<name>')
+def asset(name):
+    resp = asset_response(name)
+    if resp is None:
+        abort(404)
+    return resp
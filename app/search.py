@@ -0,0 +1,119 @@
+import logging
+from sqlalchemy import event, exc, func, literal_column, select, table, column, text
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+MAX_RESULTS = 50
+
+# عبارت دقیقاً با ایندکس trigram یکی است تا Postgres بتواند از آن استفاده کند
+_DOCUMENT = Product.name.op('||')(literal_column("' '")).op('||')(
+    func.coalesce(Product.description, literal_column("''")))
+
+_POSTGRES_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_product_search_trgm ON product "
+    "USING gin ((name || ' ' || coalesce(description, '')) gin_trgm_ops)",
+]
+
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5("
+    "name, description, content='product', content_rowid='product_id', tokenize='trigram')",
+    """CREATE TRIGGER IF NOT EXISTS product_search_ai AFTER INSERT ON product BEGIN
+        INSERT INTO product_search(rowid, name, description) VALUES (new.product_id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_search_ad AFTER DELETE ON product BEGIN
+        INSERT INTO product_search(product_search, rowid, name, description)
+        VALUES ('delete', old.product_id, old.name, old.description);
+    END""",
+    # فقط تغییر name/description سند FTS را عوض می‌کند؛ کم‌کردن موجودی در checkout نباید آن را بازنویسی کند.
+    # trigger همیشه از نو ساخته می‌شود تا نسخه قدیمی (AFTER UPDATE روی همه ستون‌ها) هم جایگزین شود
+    'DROP TRIGGER IF EXISTS product_search_au',
+    """CREATE TRIGGER product_search_au AFTER UPDATE OF name, description ON product BEGIN
+        INSERT INTO product_search(product_search, rowid, name, description)
+        VALUES ('delete', old.product_id, old.name, old.description);
+        INSERT INTO product_search(rowid, name, description) VALUES (new.product_id, new.name, new.description);
+    END""",
+    "INSERT INTO product_search(product_search) VALUES ('rebuild')",
+]
+
+_fts = table('product_search', column('rowid'), column('rank'))
+_index_available = {}
+
+
+def ensure_trigram(connection):
+    # CREATE EXTENSION دسترسی superuser/owner می‌خواهد؛ بدون آن جستجو با ILIKE و بدون ایندکس کار می‌کند
+    try:
+        with connection.begin_nested():
+            connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    except exc.DBAPIError as e:
+        logger.warning('pg_trgm unavailable, product search falls back to ILIKE: %s', e.orig)
+        _index_available.pop(str(connection.engine.url), None)
+        return False
+    return True
+
+
+def ensure_search_index(connection):
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        if ensure_trigram(connection):
+            for stmt in _POSTGRES_DDL:
+                connection.execute(text(stmt))
+    elif dialect == 'sqlite':
+        try:
+            for stmt in _SQLITE_DDL:
+                connection.execute(text(stmt))
+        except exc.OperationalError:
+            # SQLite بدون FTS5/trigram: جستجو به LIKE برمی‌گردد
+            pass
+    _index_available.pop(str(connection.engine.url), None)
+
+
+def trigram_available(connection):
+    return connection.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+
+
+event.listen(Product.__table__, 'after_create', lambda target, connection, **kw: ensure_search_index(connection))
+
+
+def _escape_like(q):
+    return q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _has_index(session, dialect):
+    key = str(session.get_bind().url)
+    if key not in _index_available:
+        if dialect == 'postgresql':
+            _index_available[key] = trigram_available(session)
+        else:
+            _index_available[key] = session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_search'")
+            ).first() is not None
+    return _index_available[key]
+
+
+def search_products(session, q, limit=MAX_RESULTS, category_id=None, columns=None):
+    q = (q or '').strip()
+    if not q:
+        return []
+
+    query = select(*columns) if columns else select(Product)
+    query = query.where(Product.is_active.is_(True))
+    if category_id:
+        query = query.where(Product.category_id == category_id)
+
+    pattern = f'%{_escape_like(q)}%'
+    dialect = session.get_bind().dialect.name
+
+    if dialect == 'postgresql' and _has_index(session, dialect):
+        query = query.where(_DOCUMENT.ilike(pattern, escape='\\')).order_by(
+            func.similarity(Product.name, q).desc(), Product.product_id.desc())
+    elif dialect == 'sqlite' and len(q) >= 3 and _has_index(session, dialect):
+        phrase = '"' + q.replace('"', '""') + '"'
+        query = query.join(_fts, _fts.c.rowid == Product.product_id).where(
+            text('product_search MATCH :fts_query').bindparams(fts_query=phrase)
+        ).order_by(_fts.c.rank, Product.product_id.desc())
+    else:
+        query = query.where(_DOCUMENT.ilike(pattern, escape='\\')).order_by(Product.product_id.desc())
+
+    result = session.execute(query.limit(max(1, min(limit, MAX_RESULTS))))
+    return result.all() if columns else result.scalars().all()
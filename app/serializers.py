@@ -0,0 +1,87 @@
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import select
+from .models import Category, Order, Payment, Product, Seller
+
+try:
+    import orjson
+except ImportError:  # orjson اختیاری است؛ بدون آن همان json استاندارد استفاده می‌شود
+    orjson = None
+
+
+class Projection:
+    # فقط ستون‌هایی که پاسخ لازم دارد خوانده می‌شوند و ردیف‌ها بدون ساختن شیء ORM به dict تبدیل می‌شوند
+    def __init__(self, *fields):
+        self.keys = tuple(f[0] for f in fields)
+        self.columns = tuple(f[1] for f in fields)
+        self._converters = tuple((f[0], f[2]) for f in fields if len(f) > 2)
+
+    def query(self, session):
+        return session.query(*self.columns)
+
+    def select(self):
+        return select(*self.columns)
+
+    def row(self, r):
+        d = dict(zip(self.keys, r))
+        for key, fn in self._converters:
+            value = d[key]
+            if value is not None:
+                d[key] = fn(value)
+        return d
+
+    def rows(self, rows):
+        return [self.row(r) for r in rows]
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+# کلیدها و ترتیبشان دقیقاً همان to_dict مدل‌ها هستند
+PRODUCT = Projection(
+    ('id', Product.product_id), ('name', Product.name), ('description', Product.description),
+    ('price', Product.price, float), ('stock', Product.stock), ('category_id', Product.category_id),
+    ('seller_id', Product.seller_id),
+)
+ORDER = Projection(
+    ('id', Order.order_id), ('user_id', Order.user_id), ('total_amount', Order.total_amount, float),
+    ('shipping_address', Order.shipping_address), ('status', Order.status),
+    ('order_date', Order.order_date, _isoformat),
+)
+PAYMENT = Projection(
+    ('id', Payment.payment_id), ('order_id', Payment.order_id), ('transaction_no', Payment.transaction_no),
+    ('amount', Payment.amount, float), ('status', Payment.status),
+)
+CATEGORY = Projection(
+    ('id', Category.category_id), ('name', Category.category_name), ('description', Category.description),
+)
+SELLER = Projection(
+    ('id', Seller.seller_id), ('store_name', Seller.store_name), ('owner_name', Seller.owner_name),
+)
+
+
+class JSONProvider(DefaultJSONProvider):
+    # تنظیمات JSON_AS_ASCII و JSON_SORT_KEYS از Config خوانده می‌شوند؛ با orjson خروجی همان بایت‌های json استاندارد است
+    def __init__(self, app):
+        super().__init__(app)
+        self.ensure_ascii = app.config.get('JSON_AS_ASCII', True)
+        self.sort_keys = app.config.get('JSON_SORT_KEYS', True)
+        self._options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+        if orjson and self.sort_keys:
+            self._options |= orjson.OPT_SORT_KEYS
+
+    def _fast(self):
+        # orjson همیشه UTF-8 می‌نویسد و تورفتگی ۲ فاصله‌ای debug را ندارد
+        return orjson is not None and not self.ensure_ascii and not self._app.debug
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs and self._fast():
+            return orjson.dumps(obj, default=self.default, option=self._options).decode()
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if not self._fast():
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,49 @@
+from flask import Response, current_app, request, stream_with_context
+
+BATCH_SIZE = 1000
+FLUSH_EVERY = 200
+
+
+def wants_stream(args=None, headers=None):
+    # ?stream=1 یک آرایه JSON جریانی می‌دهد، ?stream=ndjson یا Accept: application/x-ndjson هر رکورد در یک خط
+    args = request.args if args is None else args
+    headers = request.headers if headers is None else headers
+    mode = (args.get('stream') or '').lower()
+    if mode == 'ndjson' or 'application/x-ndjson' in headers.get('Accept', ''):
+        return 'ndjson'
+    if mode in ('1', 'true', 'json'):
+        return 'json'
+    return None
+
+
+def _json_array(items, dumps):
+    # قبل از اجرای کوئری '[' فرستاده می‌شود تا اولین بایت فوراً به کلاینت برسد
+    yield '['
+    buf, sep = [], ''
+    for item in items:
+        buf.append(dumps(item))
+        if len(buf) >= FLUSH_EVERY:
+            yield sep + ','.join(buf)
+            buf, sep = [], ','
+    if buf:
+        yield sep + ','.join(buf)
+    yield ']'
+
+
+def _ndjson(items, dumps):
+    buf = []
+    for item in items:
+        buf.append(dumps(item) + '\n')
+        if len(buf) >= FLUSH_EVERY:
+            yield ''.join(buf)
+            buf = []
+    if buf:
+        yield ''.join(buf)
+
+
+def stream_json(items, fmt='json'):
+    # items باید generator تنبل باشد (مثلاً روی query.yield_per) تا در هر لحظه فقط یک batch در حافظه باشد
+    dumps = current_app.json.dumps
+    if fmt == 'ndjson':
+        return Response(stream_with_context(_ndjson(items, dumps)), mimetype='application/x-ndjson')
+    return Response(stream_with_context(_json_array(items, dumps)), mimetype='application/json')
@@ -0,0 +1,133 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def chat_key(update):
+    for name in ('message', 'edited_message', 'channel_post', 'edited_channel_post'):
+        msg = getattr(update, name, None)
+        if msg is not None:
+            return msg.chat.id
+    call = getattr(update, 'callback_query', None)
+    if call is not None:
+        return call.message.chat.id if call.message else call.from_user.id
+    return update.update_id
+
+
+class UpdateQueue:
+    def __init__(self, handler, workers=4, maxsize=1000, dedupe_size=10000):
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.dedupe_size = dedupe_size
+        self._queues = []
+        self._threads = []
+        self._pid = None
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def _ensure_started(self):
+        # threadها بعد از fork گانیکورن از بین می‌روند؛ هر پروسه workerهای خودش را می‌سازد
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            per_worker = max(1, self.maxsize // self.workers)
+            self._queues = [queue.Queue(maxsize=per_worker) for _ in range(self.workers)]
+            self._threads = [threading.Thread(target=self._run, args=(q,), name=f'update-worker-{i}', daemon=True)
+                             for i, q in enumerate(self._queues)]
+            for t in self._threads:
+                t.start()
+            self._seen.clear()
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+
+    def submit(self, update):
+        self._ensure_started()
+        with self._lock:
+            if update.update_id in self._seen:
+                self.duplicates += 1
+                return True
+            # آپدیت‌های یک چت همیشه به یک worker می‌روند تا ترتیبشان حفظ شود
+            q = self._queues[hash(chat_key(update)) % self.workers]
+            try:
+                q.put_nowait((update, time.monotonic()))
+            except queue.Full:
+                self.rejected += 1
+                return False
+            self._seen[update.update_id] = None
+            if len(self._seen) > self.dedupe_size:
+                self._seen.popitem(last=False)
+            self.enqueued += 1
+        return True
+
+    def _run(self, q):
+        while True:
+            item = q.get()
+            if item is _STOP:
+                q.task_done()
+                return
+            update, enqueued_at = item
+            lag = time.monotonic() - enqueued_at
+            with self._lock:
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+            try:
+                self.handler([update])
+                ok = True
+            except Exception:
+                ok = False
+                logger.exception('Failed to process update %s', update.update_id)
+            finally:
+                q.task_done()
+            with self._lock:
+                if ok:
+                    self.processed += 1
+                else:
+                    self.failed += 1
+
+    def stop(self, timeout=5):
+        # _STOP پشت آپدیت‌های صف قرار می‌گیرد؛ join تا deadline صبر می‌کند تا صف‌ها قبل از خروج مفسر خالی شوند
+        if self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        for q in self._queues:
+            try:
+                q.put(_STOP, timeout=max(0, deadline - time.monotonic()))
+            except queue.Full:
+                pass
+        for t in self._threads:
+            t.join(max(0, deadline - time.monotonic()))
+        left = self.depth()
+        if left:
+            logger.warning('Update queue not drained within %ss on shutdown; %s updates dropped', timeout, left)
+        self._pid = None
+
+    def depth(self):
+        return sum(q.qsize() for q in self._queues)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'depth': self.depth(), 'depth_per_worker': [q.qsize() for q in self._queues],
+                'workers': self.workers, 'maxsize': self.maxsize,
+                'enqueued': self.enqueued, 'processed': self.processed, 'failed': self.failed,
+                'duplicates': self.duplicates, 'rejected': self.rejected,
+                'last_lag_seconds': round(self.last_lag, 4), 'max_lag_seconds': round(self.max_lag, 4),
+            }
@@ -0,0 +1,5 @@
+from app.async_api import create_asgi_app
+from run import app as flask_app
+
+# uvicorn asgi:app --workers 2  یا  gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+app = create_asgi_app(flask_app)
@@ -0,0 +1,224 @@
+import argparse
+import csv
+import io
+import random
+import time
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import text
+from app import create_app
+from app.extensions import db, password_hasher
+from app.migrations import migrate
+from app.reporting import rebuild as rebuild_rollups
+
+# داده مصنوعی با حجم واقعی برای بنچمارک؛ همه ردیف‌ها با id صریح و به صورت دسته‌ای (COPY یا executemany) نوشته می‌شوند
+
+PASSWORD = 'bench1234'
+TELEGRAM_ID_BASE = 7_000_000_000
+BATCH = 20000
+
+ADJECTIVES = ['هوشمند', 'حرفه‌ای', 'سبک', 'بی‌سیم', 'ضدآب', 'کلاسیک', 'اقتصادی', 'ویژه', 'مینی', 'پرو']
+NOUNS = ['گوشی', 'لپ‌تاپ', 'هدفون', 'کفش', 'تی‌شرت', 'قهوه‌ساز', 'کتاب', 'ساعت', 'کیف', 'اسپیکر',
+         'مانیتور', 'کیبورد', 'ماوس', 'دوربین', 'جاروبرقی', 'کتری', 'شلوار', 'عینک', 'پاوربانک', 'تبلت']
+BRANDS = ['Nova', 'Pars', 'Atlas', 'Zagros', 'Kavir', 'Orion', 'Delta', 'Sina', 'Arya', 'Helix']
+CITIES = ['تهران', 'مشهد', 'اصفهان', 'شیراز', 'تبریز', 'کرج', 'اهواز', 'قم', 'رشت', 'کرمان']
+FIRST_NAMES = ['علی', 'زهرا', 'محمد', 'فاطمه', 'حسین', 'مریم', 'رضا', 'سارا', 'امیر', 'نگار']
+LAST_NAMES = ['احمدی', 'محمدی', 'حسینی', 'رضایی', 'کریمی', 'موسوی', 'جعفری', 'صادقی', 'رحیمی', 'نوری']
+STATUSES = ['Pending'] * 10 + ['Processing'] * 20 + ['Shipped'] * 20 + ['Delivered'] * 45 + ['Cancelled'] * 5
+
+
+def _ts(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+class Loader:
+    def __init__(self, conn):
+        self.conn = conn
+        self.postgres = conn.dialect.name == 'postgresql'
+
+    def write(self, table, columns, rows):
+        if not rows:
+            return
+        if self.postgres:
+            buf = io.StringIO()
+            csv.writer(buf).writerows(rows)
+            cursor = self.conn.connection.cursor()
+            sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+            try:
+                if hasattr(cursor, 'copy'):
+                    with cursor.copy(sql) as copy:
+                        copy.write(buf.getvalue())
+                else:
+                    buf.seek(0)
+                    cursor.copy_expert(sql, buf)
+            finally:
+                cursor.close()
+        else:
+            marks = ', '.join('?' * len(columns))
+            self.conn.exec_driver_sql(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks})", rows)
+
+    def stream(self, table, columns, rows):
+        started, count, chunk = time.perf_counter(), 0, []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= BATCH:
+                self.write(table, columns, chunk)
+                count += len(chunk)
+                chunk = []
+        self.write(table, columns, chunk)
+        count += len(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"   ✅ {table}: {count:,} rows in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)")
+        return count
+
+    def next_id(self, table, pk):
+        return (self.conn.execute(text(f'SELECT MAX({pk}) FROM {table}')).scalar() or 0) + 1
+
+    def finish(self, tables):
+        if not self.postgres:
+            return
+        for table, pk in tables:
+            self.conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', '{pk}'), (SELECT MAX({pk}) FROM {table}))"))
+        self.conn.execute(text('ANALYZE'))
+
+
+def generate(engine, products, users, orders, items_per_order, sellers, categories, carts, seed):
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    password = password_hasher.hash(PASSWORD)
+
+    with engine.begin() as conn:
+        load = Loader(conn)
+        first = {t: load.next_id(t, pk) for t, pk in [
+            ('category', 'category_id'), ('seller', 'seller_id'), ('users', 'user_id'),
+            ('product', 'product_id'), ('orders', 'order_id'), ('payment', 'payment_id')]}
+
+        cat_ids = range(first['category'], first['category'] + categories)
+        load.stream('category', ('category_id', 'category_name', 'description', 'created_at'), (
+            (i, f'دسته بنچمارک {i}', f'توضیح دسته {i}', _ts(now)) for i in cat_ids))
+
+        seller_ids = range(first['seller'], first['seller'] + sellers)
+        load.stream('seller', ('seller_id', 'store_name', 'owner_name', 'phone', 'join_date', 'address', 'status',
+                               'created_at'), (
+            (i, f'فروشگاه {i}', f'{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}', f'021{i:08d}',
+             (now - timedelta(days=rnd.randrange(1500))).strftime('%Y-%m-%d'), rnd.choice(CITIES), 'Approved',
+             _ts(now)) for i in seller_ids))
+
+        user_ids = range(first['users'], first['users'] + users)
+        load.stream('users', ('user_id', 'first_name', 'last_name', 'phone', 'email', 'username', 'password', 'role',
+                              'telegram_id', 'address', 'is_active', 'created_at'), (
+            (i, rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES), f'bench-{i}', f'bench{i}@example.com',
+             f'bench_{i}', password, 'customer', TELEGRAM_ID_BASE + i, f'{rnd.choice(CITIES)}، خیابان {i % 500}',
+             1, _ts(now - timedelta(days=rnd.randrange(730)))) for i in user_ids))
+
+        # قیمت‌ها در حافظه می‌مانند تا total_amount سفارش‌ها با اقلامشان یکی باشد
+        product_ids = range(first['product'], first['product'] + products)
+        prices = [round(rnd.lognormvariate(13, 1.2), -3) + 1000 for _ in product_ids]
+        load.stream('product', ('product_id', 'seller_id', 'category_id', 'name', 'description', 'price', 'stock',
+                                'is_active', 'created_at'), (
+            (pid, rnd.choice(seller_ids), rnd.choice(cat_ids),
+             f'{rnd.choice(NOUNS)} {rnd.choice(ADJECTIVES)} {rnd.choice(BRANDS)} {pid}',
+             f'{rnd.choice(NOUNS)} {rnd.choice(BRANDS)} با گارانتی {rnd.randrange(6, 25)} ماهه',
+             f'{prices[n]:.2f}', rnd.randrange(1000, 100000), int(rnd.random() < 0.95),
+             _ts(now - timedelta(days=rnd.randrange(365)))) for n, pid in enumerate(product_ids)))
+
+        def popular_product():
+            # توزیع پرطرفدار: بخش کوچکی از محصولات بیشتر سفارش‌ها را می‌گیرند
+            return int(products * rnd.random() ** 3)
+
+        order_rows, item_rows, payment_rows = [], [], []
+
+        def flush():
+            load.write('orders', ('order_id', 'user_id', 'order_date', 'total_amount', 'shipping_address', 'status',
+                                  'created_at'), order_rows)
+            load.write('order_item', ('order_id', 'product_id', 'quantity', 'item_price'), item_rows)
+            load.write('payment', ('payment_id', 'order_id', 'transaction_no', 'amount', 'method', 'status',
+                                   'created_at'), payment_rows)
+            written = len(item_rows)
+            order_rows.clear()
+            item_rows.clear()
+            payment_rows.clear()
+            return written
+
+        # سفارش، اقلام و پرداخت با هم ساخته می‌شوند تا جمع سفارش و کلیدهای خارجی همیشه سازگار باشند
+        started, count, payment_id = time.perf_counter(), 0, first['payment']
+        for oid in range(first['orders'], first['orders'] + orders):
+            picked = set()
+            while len(picked) < min(items_per_order, products):
+                picked.add(popular_product())
+            total = 0
+            for n in picked:
+                qty = 1 + int(rnd.random() ** 4 * 5)
+                total += prices[n] * qty
+                item_rows.append((oid, first['product'] + n, qty, f'{prices[n]:.2f}'))
+            date = now - timedelta(seconds=rnd.randrange(365 * 86400))
+            status = rnd.choice(STATUSES)
+            order_rows.append((oid, rnd.choice(user_ids), _ts(date), f'{total:.2f}', rnd.choice(CITIES), status,
+                               _ts(date)))
+            if status != 'Cancelled':
+                payment_rows.append((payment_id, oid, f'BENCH-{oid}', f'{total:.2f}', 'Shaparak', 'Successful',
+                                     _ts(date)))
+                payment_id += 1
+            if len(item_rows) >= BATCH:
+                count += flush()
+        count += flush()
+        elapsed = time.perf_counter() - started
+        print(f"   ✅ orders/order_item/payment: {orders:,} orders, {count:,} items in {elapsed:.1f}s "
+              f"({count / max(elapsed, 1e-9):,.0f} items/s)")
+
+        cart_users = user_ids[:carts]
+        load.stream('cart', ('user_id', 'product_id', 'quantity'), (
+            (uid, first['product'] + n, rnd.randrange(1, 4))
+            for uid in cart_users for n in {popular_product() for _ in range(3)}))
+
+        # سفارش‌ها مستقیم با COPY نوشته شده‌اند، پس گزارش فروش یک بار کامل از نو ساخته می‌شود
+        started = time.perf_counter()
+        rows = rebuild_rollups(conn)
+        print(f"   ✅ sales_rollup: {rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+        load.finish([(t, pk) for t, pk in [
+            ('category', 'category_id'), ('seller', 'seller_id'), ('users', 'user_id'),
+            ('product', 'product_id'), ('orders', 'order_id'), ('payment', 'payment_id')]])
+
+
+PRESETS = {
+    # products, users, orders, items_per_order, sellers, categories, carts
+    'small': (20_000, 2_000, 10_000, 4, 200, 20, 500),
+    'medium': (200_000, 20_000, 250_000, 4, 1_000, 40, 2_000),
+    'large': (1_000_000, 100_000, 2_500_000, 4, 2_000, 50, 10_000),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ساخت داده مصنوعی برای بنچمارک')
+    parser.add_argument('--preset', choices=PRESETS, default='small')
+    parser.add_argument('--products', type=int)
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--orders', type=int)
+    parser.add_argument('--items-per-order', type=int)
+    parser.add_argument('--sellers', type=int)
+    parser.add_argument('--categories', type=int)
+    parser.add_argument('--carts', type=int, help='تعداد کاربرانی که سبد خرید پر دارند')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    names = ('products', 'users', 'orders', 'items_per_order', 'sellers', 'categories', 'carts')
+    volumes = {name: getattr(args, name) or default for name, default in zip(names, PRESETS[args.preset])}
+
+    app = create_app()
+    with app.app_context():
+        print("⏳ آماده‌سازی جداول...")
+        db.create_all()
+        migrate(db.engine)
+        print(f"⏳ ساخت داده: {volumes}")
+        started = time.perf_counter()
+        generate(db.engine, seed=args.seed, **volumes)
+        print(f"🎉 تمام شد در {time.perf_counter() - started:.1f}s؛ رمز همه کاربران bench_*: {PASSWORD}")
+
+
+if __name__ == '__main__':
+    main()
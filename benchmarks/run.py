@@ -0,0 +1,279 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ.setdefault('BOT_TOKEN', '123456:BENCHMARK')
+
+from app.config import Config
+
+os.environ.setdefault('DATABASE_URL', Config.SQLALCHEMY_DATABASE_URI)
+
+import telebot
+from flask_jwt_extended import create_access_token
+from sqlalchemy import text
+from telebot import apihelper
+from app import create_app
+from app.extensions import db
+from benchmarks.generate import PASSWORD
+
+# سناریوها روی routeهای واقعی Flask (با test client) و هندلرهای واقعی ربات اجرا می‌شوند؛
+# درخواست‌های ربات به API تلگرام با CUSTOM_REQUEST_SENDER جواب ساختگی می‌گیرند
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+class FakeTelegramResponse:
+    status_code = 200
+
+    def __init__(self, params):
+        chat_id = int((params or {}).get('chat_id') or 1)
+        self._json = {'ok': True, 'result': {
+            'message_id': 1, 'date': int(time.time()), 'chat': {'id': chat_id, 'type': 'private'}, 'text': ''}}
+        self.text = json.dumps(self._json)
+
+    def json(self):
+        return self._json
+
+
+def fake_sender(method, url, params=None, **kwargs):
+    return FakeTelegramResponse(params)
+
+
+class Fixture:
+    def __init__(self, app, rnd):
+        self.rnd = rnd
+        with app.app_context():
+            rows = db.session.execute(text(
+                "SELECT user_id, telegram_id FROM users WHERE username LIKE 'bench\\_%' ESCAPE '\\' "
+                "ORDER BY user_id LIMIT 1000")).all()
+            if not rows:
+                sys.exit('❌ کاربر بنچمارک پیدا نشد؛ ابتدا python -m benchmarks.generate را اجرا کنید.')
+            self.users = [r.user_id for r in rows]
+            self.telegram_ids = [r.telegram_id for r in rows]
+            self.usernames = [f'bench_{uid}' for uid in self.users]
+            self.tokens = {uid: create_access_token(identity=str(uid)) for uid in self.users}
+            lo, hi = db.session.execute(text('SELECT MIN(product_id), MAX(product_id) FROM product')).one()
+            self.product_range = (lo, hi)
+            self.categories = list(db.session.execute(text('SELECT category_id FROM category')).scalars())
+        self.words = ['گوشی', 'هدفون', 'Nova', 'Atlas', 'کتاب', 'ساعت', 'Pars', 'کیف']
+
+    def product_id(self):
+        lo, hi = self.product_range
+        # مثل داده تولیدشده، محصولات ابتدای بازه پرطرفدارترند
+        return lo + int((hi - lo) * self.rnd.random() ** 3)
+
+    def user(self):
+        return self.rnd.choice(self.users)
+
+    def auth(self, uid=None):
+        return {'Authorization': f'Bearer {self.tokens[uid or self.user()]}'}
+
+
+def http_scenarios(fx):
+    def get(url, **kw):
+        return lambda client: client.get(url() if callable(url) else url, **kw)
+
+    def with_auth(url):
+        return lambda client: client.get(url() if callable(url) else url, headers=fx.auth())
+
+    def checkout(client):
+        items = [{'product_id': fx.product_id(), 'quantity': 1} for _ in range(fx.rnd.randint(1, 3))]
+        return client.post('/api/checkout', json={'items': items, 'shipping_address': 'بنچمارک'}, headers=fx.auth())
+
+    def login(client):
+        return client.post('/api/auth/login', json={'username': fx.rnd.choice(fx.usernames), 'password': PASSWORD})
+
+    return {
+        'GET /api/products': get('/api/products?limit=50'),
+        'GET /api/products?after': get(lambda: f'/api/products?limit=50&after={fx.product_id()}'),
+        'GET /api/products?category_id': get(lambda: f'/api/products?category_id={fx.rnd.choice(fx.categories)}'),
+        'GET /api/products?search': get(lambda: f'/api/products?search={fx.rnd.choice(fx.words)}'),
+        'GET /api/categories': get('/api/categories'),
+        'GET /api/orders': with_auth('/api/orders'),
+        'GET /api/admin/orders': with_auth('/api/admin/orders?status=Delivered'),
+        'POST /api/checkout': checkout,
+        'POST /api/auth/login': login,
+    }
+
+
+def bot_scenarios(fx, bot):
+    counter = iter(range(1, 10 ** 12))
+    lock = threading.Lock()
+
+    def update_id():
+        with lock:
+            return next(counter)
+
+    def message(tid, body):
+        return telebot.types.Update.de_json({'update_id': update_id(), 'message': {
+            'message_id': 1, 'date': int(time.time()), 'text': body,
+            'chat': {'id': tid, 'type': 'private'}, 'from': {'id': tid, 'is_bot': False, 'first_name': 'bench'}}})
+
+    def callback(tid, data):
+        return telebot.types.Update.de_json({'update_id': update_id(), 'callback_query': {
+            'id': str(update_id()), 'data': data, 'chat_instance': '1',
+            'from': {'id': tid, 'is_bot': False, 'first_name': 'bench'},
+            'message': {'message_id': 1, 'date': int(time.time()), 'chat': {'id': tid, 'type': 'private'}}}})
+
+    def send(*updates):
+        bot.process_new_updates(list(updates))
+
+    def tid():
+        return fx.rnd.choice(fx.telegram_ids)
+
+    def search():
+        chat = tid()
+        send(message(chat, '🔎 جستجو'))
+        send(message(chat, fx.rnd.choice(fx.words)))
+
+    return {
+        'bot /start': lambda: send(message(tid(), '/start')),
+        'bot products': lambda: send(message(tid(), '🛍 محصولات')),
+        'bot add_to_cart': lambda: send(callback(tid(), f'add_{fx.product_id()}')),
+        'bot show_cart': lambda: send(message(tid(), '🛒 سبد خرید')),
+        'bot search': search,
+    }
+
+
+def measure(fn, requests, concurrency, warmup):
+    for _ in range(warmup):
+        fn()
+    latencies, errors = [], []
+    per_worker = max(1, requests // concurrency)
+
+    def worker():
+        local, failed = [], 0
+        for _ in range(per_worker):
+            started = time.perf_counter()
+            try:
+                ok = fn()
+            except Exception:
+                ok = False
+            local.append(time.perf_counter() - started)
+            if ok is False:
+                failed += 1
+        latencies.extend(local)
+        errors.append(failed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies), 'errors': sum(errors), 'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(cuts[49] * 1000, 2), 'p95_ms': round(cuts[94] * 1000, 2), 'p99_ms': round(cuts[98] * 1000, 2),
+    }
+
+
+def http_call(app, scenario):
+    local = threading.local()
+
+    def call():
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        return scenario(client).status_code < 500
+    return call
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms → {current['p95_ms']}ms")
+        if current['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['rps']} → {current['rps']} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='بنچمارک routeهای وب و هندلرهای ربات')
+    parser.add_argument('--requests', type=int, default=500, help='تعداد درخواست برای هر سناریو')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--only', help='فقط سناریوهایی که این عبارت را دارند')
+    parser.add_argument('--skip-writes', action='store_true', help='بدون checkout و add_to_cart')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.2, help='حداکثر افت مجاز نسبت به baseline')
+    parser.add_argument('--output', help='ذخیره نتایج به صورت JSON')
+    args = parser.parse_args()
+
+    app = create_app()
+    fx = Fixture(app, random.Random(args.seed))
+
+    apihelper.CUSTOM_REQUEST_SENDER = fake_sender
+    from bot import bot
+
+    scenarios = {name: http_call(app, fn) for name, fn in http_scenarios(fx).items()}
+    bot_cases = bot_scenarios(fx, bot)
+    bot_names = set(bot_cases)
+    scenarios.update(bot_cases)
+    if args.only:
+        scenarios = {k: v for k, v in scenarios.items() if args.only in k}
+    if args.skip_writes:
+        scenarios = {k: v for k, v in scenarios.items() if 'checkout' not in k and 'add_to_cart' not in k}
+
+    results = {}
+    print(f"{'scenario':32} {'req':>6} {'err':>5} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, fn in scenarios.items():
+        # printهای ربات خروجی گزارش را شلوغ می‌کنند؛ stdout یک بار برای کل سناریو (نه هر thread) عوض می‌شود
+        quiet = contextlib.redirect_stdout(io.StringIO()) if name in bot_names else contextlib.nullcontext()
+        with quiet:
+            r = results[name] = measure(fn, args.requests, args.concurrency, args.warmup)
+        print(f"{name:32} {r['requests']:>6} {r['errors']:>5} {r['rps']:>9} "
+              f"{r['p50_ms']:>8}ms {r['p95_ms']:>8}ms {r['p99_ms']:>8}ms")
+
+    with app.app_context():
+        volumes = {t: db.session.execute(text(f'SELECT COUNT(*) FROM {t}')).scalar()
+                   for t in ('product', 'users', 'orders', 'order_item')}
+        database = db.engine.dialect.name
+    report = {
+        'database': database, 'volumes': volumes, 'python': platform.python_version(),
+        'requests': args.requests, 'concurrency': args.concurrency, 'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✅ baseline در {args.baseline} ذخیره شد.")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('database') != report['database']:
+            print(f"⚠️ baseline روی {baseline.get('database')} گرفته شده؛ مقایسه با {report['database']} معتبر نیست.")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("❌ افت کارایی نسبت به baseline:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print("✅ نسبت به baseline افتی دیده نشد.")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,14 @@ import os
 import telebot
 from telebot import types
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker, scoped_session
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.carts import cart_summary
+from app.extensions import cart_buffer, get_engine, password_hasher, replicas, telegram_user_cache
+from app.hashing import HashingBusy
+from app.ordering import InsufficientStock, place_order_from_cart
+from app.replicas import RoutingSession
+from app.search import search_products
 
 load_dotenv()
 
@@ -16,14 +21,16 @@ if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 bot = telebot.TeleBot(BOT_TOKEN, threaded=False)
 
+BUSY_MESSAGE = "⏳ سرور مشغول است، لطفاً چند لحظه دیگر دوباره تلاش کنید."
+
 # --- تنظیمات اتصال دیتابیس ---
 engine = None
 db_session = None
 
 try:
     if DATABASE_URL:
-        engine = create_engine(DATABASE_URL, pool_pre_ping=True, pool_recycle=300)
-        session_factory = sessionmaker(bind=engine)
+        engine = get_engine()
+        session_factory = sessionmaker(bind=engine, class_=RoutingSession)
         db_session = scoped_session(session_factory)
         print("✅ Database Connected.")
 except Exception as e:
@@ -35,11 +42,14 @@ def get_logged_in_user(telegram_id):
     if not db_session: 
         print("❌ DB Session is None!")
         return None
+
+    user = telegram_user_cache.get(telegram_id)
+    if user is not None:
+        return user
         
+    generation = telegram_user_cache.generation
     session = db_session()
     try:
-        session.commit()
-        
         print(f"🔍 Checking Login for Telegram ID: {telegram_id}")
         
         sql = text("SELECT user_id, first_name, username, phone, email, address FROM users WHERE telegram_id = :tid")
@@ -47,6 +57,7 @@ def get_logged_in_user(telegram_id):
         
         if user:
             print(f"✅ User Found: {user[2]} (ID: {user[0]})")
+            telegram_user_cache.set(telegram_id, user, generation)
             return user
         else:
             print(f"⚠️ User NOT Found for ID: {telegram_id}")
@@ -57,7 +68,7 @@ def get_logged_in_user(telegram_id):
         session.rollback()
         return None
     finally:
-        pass 
+        db_session.remove()
 
 def connect_telegram_to_account(username, password, telegram_id):
     if not db_session: return False
@@ -69,25 +80,33 @@ def connect_telegram_to_account(username, password, telegram_id):
         session.execute(text("UPDATE users SET telegram_id = NULL WHERE telegram_id = :tid"), {'tid': telegram_id})
         
         # ۲. پیدا کردن کاربر
-        sql = text("SELECT user_id, password FROM users WHERE username = :u")
+        sql = text("SELECT user_id, password, telegram_id FROM users WHERE username = :u")
         user = session.execute(sql, {'u': username}).fetchone()
         
         if user:
             db_user_id = user[0]
             db_password_hash = user[1]
+            previous_tid = user[2]
             
             # ۳. بررسی پسورد
-            is_valid = False
+            is_valid, new_hash = False, None
             try:
-                is_valid = check_password_hash(db_password_hash, password)
-            except:
-                is_valid = (db_password_hash == password)
+                is_valid, new_hash = password_hasher.verify(db_password_hash, password)
+            except HashingBusy:
+                raise
+            except Exception:
+                pass
+            if not is_valid and db_password_hash == password:
+                # پسورد قدیمی ذخیره‌شده به صورت متن ساده؛ همین‌جا هش می‌شود
+                is_valid, new_hash = True, password_hasher.hash(password)
 
             if is_valid:
                 # ۴. آپدیت دیتابیس با Telegram ID
-                update_sql = text("UPDATE users SET telegram_id = :tid WHERE user_id = :uid")
-                session.execute(update_sql, {'tid': telegram_id, 'uid': db_user_id})
+                update_sql = text("UPDATE users SET telegram_id = :tid, password = COALESCE(:pw, password) WHERE user_id = :uid")
+                session.execute(update_sql, {'tid': telegram_id, 'pw': new_hash, 'uid': db_user_id})
                 session.commit() 
+                telegram_user_cache.invalidate(telegram_id)
+                if previous_tid: telegram_user_cache.invalidate(previous_tid)
                 print(f"✅ Login Successful! DB Updated for User ID: {db_user_id}")
                 return True
             else:
@@ -96,6 +115,9 @@ def connect_telegram_to_account(username, password, telegram_id):
             print("❌ User Not Found")
         
         return False
+    except HashingBusy:
+        session.rollback()
+        raise
     except Exception as e:
         session.rollback()
         print(f"❌ Login Exception: {e}")
@@ -110,16 +132,22 @@ def register_new_account(username, password, first_name, telegram_id):
         check = session.execute(text("SELECT user_id FROM users WHERE username = :u"), {'u': username}).fetchone()
         if check: return False
 
-        hashed_pw = generate_password_hash(password)
+        hashed_pw = password_hasher.hash(password)
 
+        # telegram_id یکتاست؛ اتصال قبلی این حساب تلگرام برداشته می‌شود
+        session.execute(text("UPDATE users SET telegram_id = NULL WHERE telegram_id = :tid"), {'tid': telegram_id})
         sql = text("""
             INSERT INTO users (username, password, first_name, telegram_id, role, is_active)
             VALUES (:u, :p, :fn, :tid, 'customer', TRUE)
         """)
         session.execute(sql, {'u': username, 'p': hashed_pw, 'fn': first_name, 'tid': telegram_id})
         session.commit()
+        telegram_user_cache.invalidate(telegram_id)
         print(f"✅ Registered New User: {username}")
         return True
+    except HashingBusy:
+        session.rollback()
+        raise
     except Exception as e:
         session.rollback()
         print(f"❌ Register Error: {e}")
@@ -186,7 +214,12 @@ def login_step_2(message):
     bot.register_next_step_handler(msg, lambda m: login_step_3(m, username))
 
 def login_step_3(message, username):
-    if connect_telegram_to_account(username, message.text, message.from_user.id):
+    try:
+        connected = connect_telegram_to_account(username, message.text, message.from_user.id)
+    except HashingBusy:
+        bot.reply_to(message, BUSY_MESSAGE, reply_markup=main_menu(False))
+        return
+    if connected:
         user = get_logged_in_user(message.from_user.id)
         if user:
             bot.reply_to(message, "✅ ورود موفقیت‌آمیز بود!", reply_markup=main_menu(True))
@@ -202,13 +235,19 @@ def reg_step_2(message):
     bot.register_next_step_handler(msg, lambda m: reg_step_3(m, username))
 
 def reg_step_3(message, username):
-    if register_new_account(username, message.text, message.from_user.first_name, message.from_user.id):
+    try:
+        registered = register_new_account(username, message.text, message.from_user.first_name, message.from_user.id)
+    except HashingBusy:
+        bot.reply_to(message, BUSY_MESSAGE, reply_markup=main_menu(False))
+        return
+    if registered:
         bot.reply_to(message, "🎉 اکانت ساخته شد!", reply_markup=main_menu(True))
     else:
         bot.reply_to(message, "❌ نام کاربری تکراری.", reply_markup=main_menu(False))
 
 # --- محصولات ---
 @bot.message_handler(func=lambda m: m.text == '🛍 محصولات')
+@replicas.read_only
 def show_products(message):
     if not db_session: return
     session = db_session()
@@ -242,24 +281,17 @@ def add_to_cart(call):
         bot.answer_callback_query(call.id, "⚠️ لطفاً ابتدا وارد حساب شوید", show_alert=True)
         return
 
-    session = db_session()
     try:
         p_id = int(call.data.split('_')[1])
         print(f"🛒 Adding product {p_id} for User ID {user[0]}")
         
-        sql = text("""
-            INSERT INTO cart (user_id, product_id, quantity) VALUES (:uid, :pid, 1)
-            ON CONFLICT (user_id, product_id) DO UPDATE SET quantity = cart.quantity + 1
-        """)
-        session.execute(sql, {'uid': user[0], 'pid': p_id})
-        session.commit()
+        # ضربه‌های پشت‌سرهم در بافر جمع می‌شوند و با یک upsert نوشته می‌شوند
+        cart_buffer.add(user[0], p_id)
+        replicas.written()
         bot.answer_callback_query(call.id, "✅ به سبد اضافه شد", show_alert=False)
     except Exception as e:
-        session.rollback()
         print(f"❌ Add Cart Error: {e}")
         bot.answer_callback_query(call.id, "❌ خطا در افزودن", show_alert=True)
-    finally:
-        db_session.remove()
 
 # --- سبد خرید ---
 @bot.message_handler(func=lambda m: m.text == '🛒 سبد خرید')
@@ -271,25 +303,20 @@ def show_cart(message):
         bot.reply_to(message, "برای مشاهده سبد خرید باید وارد شوید.", reply_markup=main_menu(False))
         return
 
+    # flush روی primary می‌نویسد؛ خواندن سبد هم باید از primary باشد (بدون read_only)
+    cart_buffer.flush(user[0])
     session = db_session()
     try:
-        items = session.execute(text("""
-            SELECT p.name, p.price, c.quantity 
-            FROM cart c JOIN product p ON c.product_id = p.product_id 
-            WHERE c.user_id = :uid
-        """), {'uid': user[0]}).fetchall()
+        summary = cart_summary(session, user[0])
         
-        if not items:
+        if not summary['items']:
             bot.reply_to(message, "سبد خرید شما خالی است.")
             return
 
-        total = 0
         msg = "🛒 **سبد خرید شما:**\n\n"
-        for item in items:
-            sub = item[1] * item[2]
-            total += sub
-            msg += f"- {item[0]} ({item[2]} عدد) = {int(sub):,}\n"
-        msg += f"\n💰 **جمع کل: {int(total):,} تومان**"
+        for item in summary['items']:
+            msg += f"- {item['name']} ({item['quantity']} عدد) = {int(item['line_total']):,}\n"
+        msg += f"\n💰 **جمع کل: {int(summary['total']):,} تومان**"
         
         markup = types.InlineKeyboardMarkup()
         markup.add(types.InlineKeyboardButton("✅ نهایی کردن خرید", callback_data="checkout_final"))
@@ -307,6 +334,7 @@ def clear_cart(call):
     user = get_logged_in_user(call.from_user.id)
     if not user: return
     
+    cart_buffer.discard(user[0])
     session = db_session()
     try:
         session.execute(text("DELETE FROM cart WHERE user_id = :uid"), {'uid': user[0]})
@@ -324,37 +352,23 @@ def checkout(call):
     user = get_logged_in_user(call.from_user.id)
     if not user: return
 
+    cart_buffer.flush(user[0])
     session = db_session()
     try:
         addr = user[5] if user[5] and len(user[5]) > 5 else "خرید سریع تلگرامی"
 
-        cart_items = session.execute(text("SELECT product_id, quantity FROM cart WHERE user_id = :uid"), {'uid': user[0]}).fetchall()
-        if not cart_items:
+        placed = place_order_from_cart(session, user[0], addr)
+        if not placed:
             bot.send_message(call.message.chat.id, "سبد خالی است!")
             return
-
-        total = 0
-        order_items = []
-        for item in cart_items:
-            prod = session.execute(text("SELECT price FROM product WHERE product_id = :pid"), {'pid': item[0]}).fetchone()
-            if prod:
-                total += prod[0] * item[1]
-                order_items.append({'pid': item[0], 'qty': item[1], 'price': prod[0]})
-
-        oid = session.execute(text("""
-            INSERT INTO orders (user_id, total_amount, shipping_address, status) 
-            VALUES (:uid, :tot, :addr, 'Processing') RETURNING order_id
-        """), {'uid': user[0], 'tot': total, 'addr': addr}).scalar()
-
-        for i in order_items:
-            session.execute(text("INSERT INTO order_item (order_id, product_id, quantity, item_price) VALUES (:oid, :pid, :qty, :pr)"),
-                            {'oid': oid, 'pid': i['pid'], 'qty': i['qty'], 'pr': i['price']})
-
-        session.execute(text("DELETE FROM cart WHERE user_id = :uid"), {'uid': user[0]})
         session.commit()
+        oid, total = placed.order_id, placed.total_amount
 
         bot.edit_message_text(f"✅ سفارش شما با موفقیت ثبت شد!\n🔖 کد رهگیری: `{oid}`\n💰 مبلغ: {int(total):,} تومان", 
                               call.message.chat.id, call.message.message_id, parse_mode='Markdown')
+    except InsufficientStock as e:
+        session.rollback()
+        bot.send_message(call.message.chat.id, f"❌ {e}")
     except Exception as e:
         session.rollback()
         print(f"Checkout Error: {e}")
@@ -379,6 +393,7 @@ def logout(message):
     try:
         session.execute(text("UPDATE users SET telegram_id = NULL WHERE telegram_id = :tid"), {'tid': message.from_user.id})
         session.commit()
+        telegram_user_cache.invalidate(message.from_user.id)
         bot.reply_to(message, "خارج شدید.", reply_markup=main_menu(False))
     except:
         session.rollback()
@@ -391,16 +406,17 @@ def ask_search(m):
     msg = bot.reply_to(m, "نام محصول:", reply_markup=types.ForceReply())
     bot.register_next_step_handler(msg, do_search)
 
+@replicas.read_only
 def do_search(m):
     if m.text in ['🔄 شروع مجدد ربات', '🛍 محصولات', '🛒 سبد خرید']: return restart_btn(m)
     
     if not db_session: return
     session = db_session()
     try:
-        res = session.execute(text("SELECT product_id, name, price FROM product WHERE name ILIKE :q"), {'q': f'%{m.text}%'}).fetchall()
+        res = search_products(session, m.text, limit=10)
         if res:
             bot.reply_to(m, f"✅ {len(res)} محصول:", reply_markup=main_menu(True))
-            for p in res: send_product_card(m.chat.id, p)
+            for p in res: send_product_card(m.chat.id, (p.product_id, p.name, p.price))
         else:
             bot.reply_to(m, "یافت نشد.")
     except:
@@ -7,8 +7,9 @@ load_dotenv()
 from app import create_app
 from app.extensions import db
 from app.models import User, Category, Product, Seller
+from app.migrations import migrate
+from app.extensions import password_hasher
 from sqlalchemy import text
-from werkzeug.security import generate_password_hash
 
 def run_super_fix():
     app = create_app()
@@ -23,6 +24,7 @@ def run_super_fix():
 
         print("\n⏳ مرحله ۱: بازسازی جداول...")
         db.create_all()
+        migrate(db.engine)
         print("✅ جداول آماده‌اند.")
 
         print("\n⏳ مرحله ۲: ساخت کاربران...")
@@ -30,7 +32,7 @@ def run_super_fix():
         if not User.query.filter_by(username='admin').first():
             db.session.add(User(
                 first_name='مدیر', last_name='سیستم', username='admin',
-                password=generate_password_hash('admin'), 
+                password=password_hasher.hash('admin'), 
                 email='admin@market.com', phone='09001111111', role='admin'
             ))
             print("✅ ادمین ساخته شد.")
@@ -38,7 +40,7 @@ def run_super_fix():
         if not User.query.filter_by(username='ali_ahmadi').first():
             db.session.add(User(
                 first_name='علی', last_name='احمدی', username='ali_ahmadi',
-                password=generate_password_hash('123456'), 
+                password=password_hasher.hash('123456'), 
                 email='ali@test.com', phone='09121234567', role='customer'
             ))
             print("✅ مشتری تست ساخته شد.")
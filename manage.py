@@ -0,0 +1,85 @@
+import argparse
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import create_app
+from app.extensions import db
+from app import assets, bulk, migrations, reporting
+
+
+def cmd_migrate(args):
+    if args.status:
+        for version, description, applied in migrations.status(db.engine):
+            print(f"{'✅' if applied else '⏳'} {version}  {description}")
+        return
+    migrations.migrate(db.engine)
+
+
+def cmd_import_products(args):
+    fmt = args.format or bulk.detect_format(args.path)
+    with open(args.path, 'rb') as f:
+        result = bulk.import_products(db.engine, f, fmt, chunk_size=args.chunk_size)
+    print(f"✅ {result.inserted} اضافه، {result.updated} به‌روزرسانی، {result.rejected} رد شد.")
+    for e in result.errors:
+        print(f"   ❌ خط {e['line']}: {e['error']}")
+
+
+def cmd_export_products(args):
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        for part in bulk.export_products(db.engine, args.format):
+            out.write(part)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def cmd_rebuild_rollups(args):
+    with db.engine.begin() as conn:
+        rows = reporting.rebuild(conn)
+    print(f"✅ گزارش فروش از نو ساخته شد ({rows} ردیف).")
+
+
+def cmd_build_assets(args):
+    from flask import current_app
+    manifest = assets.build(current_app, args.output)
+    for name in [p['file'] for p in manifest['pages'].values()] + manifest['assets']:
+        print(f"✅ {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ابزارهای مدیریتی دیجی‌مارکت')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('migrate', help='اعمال migrationهای دیتابیس')
+    p.add_argument('--status', action='store_true', help='فقط نمایش وضعیت migrationها')
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser('import-products', help='ورود گروهی محصولات از CSV یا JSONL')
+    p.add_argument('path')
+    p.add_argument('--format', choices=bulk.FORMATS)
+    p.add_argument('--chunk-size', type=int, default=bulk.CHUNK_SIZE)
+    p.set_defaults(func=cmd_import_products)
+
+    p = sub.add_parser('export-products', help='خروجی گرفتن از محصولات')
+    p.add_argument('--format', choices=bulk.FORMATS, default='csv')
+    p.add_argument('--output', '-o')
+    p.set_defaults(func=cmd_export_products)
+
+    p = sub.add_parser('rebuild-rollups', help='ساخت دوباره جدول تجمیعی گزارش فروش از روی سفارش‌ها')
+    p.set_defaults(func=cmd_rebuild_rollups)
+
+    p = sub.add_parser('build-assets', help='ساخت صفحه‌های فروشگاه با فایل‌های hash‌دار و فشرده')
+    p.add_argument('--output', '-o', help='پیش‌فرض ASSET_BUILD_DIR')
+    p.set_defaults(func=cmd_build_assets)
+
+    args = parser.parse_args()
+    app = create_app()
+    with app.app_context():
+        args.func(args)
+
+
+if __name__ == '__main__':
+    main()
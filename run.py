@@ -1,9 +1,14 @@
 import os
 import logging
 import telebot
-from flask import request
+from flask import request, jsonify
 from dotenv import load_dotenv
 from app import create_app
+from app.extensions import replicas
+from app.instrumentation import track
+from app.metrics import REGISTRY, instrument_bot
+from app.permissions import admin_required
+from app.update_queue import UpdateQueue
 from bot import bot
 
 logging.basicConfig(level=logging.INFO)
@@ -14,16 +19,43 @@ app = create_app()
 
 WEBHOOK_URL = os.getenv('WEBHOOK_URL')
 
+def process_updates(updates):
+    kind = next((k for k in ('message', 'callback_query', 'edited_message') if getattr(updates[0], k, None)), 'other')
+    sender = getattr(getattr(updates[0], kind, None), 'from_user', None)
+    # نوشتن هر کاربر، خواندن‌های بعدی همان کاربر را برای چند ثانیه به primary می‌فرستد
+    with track(f'bot:{kind}', budget=app.config['SQL_QUERY_BUDGET']), \
+            replicas.routing(f'tg:{sender.id}' if sender else None):
+        bot.process_new_updates(updates)
+
+update_queue = UpdateQueue(
+    process_updates,
+    workers=app.config['WEBHOOK_WORKERS'],
+    maxsize=app.config['WEBHOOK_QUEUE_SIZE'],
+)
+
+instrument_bot(bot)
+REGISTRY.register_callback(
+    'webhook_queue', 'Telegram update queue depth, lag and counters.', 'gauge',
+    lambda: [({'stat': k}, v) for k, v in update_queue.stats().items() if not isinstance(v, list)]
+)
+
 @app.route('/webhook', methods=['POST'])
 def webhook():
     if request.headers.get('content-type') == 'application/json':
         json_string = request.get_data().decode('utf-8')
         update = telebot.types.Update.de_json(json_string)
-        bot.process_new_updates([update])
+        if not update_queue.submit(update):
+            # صف پر است؛ تلگرام بعداً دوباره ارسال می‌کند
+            return 'Busy', 503
         return '', 200
     else:
         return 'Access denied', 403
 
+@app.route('/webhook/stats', methods=['GET'])
+@admin_required
+def webhook_stats():
+    return jsonify(update_queue.stats())
+
 def set_webhook_on_startup():
     token = os.getenv('BOT_TOKEN')
     if not token or not WEBHOOK_URL:
@@ -0,0 +1,59 @@
+import os
+import tempfile
+from datetime import date
+
+# Config هنگام import خوانده می‌شود؛ آدرس دیتابیس تست باید قبل از import اپ تنظیم شود
+_DB_PATH = os.path.join(tempfile.mkdtemp(prefix='marketplace-tests-'), 'test.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{_DB_PATH}'
+os.environ['DATABASE_REPLICA_URLS'] = ''
+os.environ['CART_WRITE_WINDOW'] = '0'
+
+import pytest
+from flask_jwt_extended import create_access_token
+from app import create_app
+from app.extensions import db, reference_cache
+from app.models import Category, Product, Seller, User
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def session(app):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        reference_cache.invalidate()
+        yield db.session
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app, session):
+    return app.test_client()
+
+
+@pytest.fixture
+def catalog(session):
+    category = Category(category_name='کتاب')
+    seller = Seller(store_name='فروشگاه', owner_name='مالک', phone='0912', join_date=date(2024, 1, 1), address='تهران')
+    session.add_all([category, seller])
+    session.flush()
+    products = [Product(name=f'محصول {i}', price=1000 * i, stock=10, category_id=category.category_id,
+                        seller_id=seller.seller_id, is_active=True) for i in range(1, 8)]
+    customer = User(first_name='علی', last_name='رضایی', phone='0911', email='ali@example.com',
+                    username='ali', password='-', role='customer')
+    admin = User(first_name='مدیر', last_name='سایت', phone='0910', email='admin@example.com',
+                 username='admin', password='-', role='admin')
+    session.add_all(products + [customer, admin])
+    session.commit()
+    return {'category': category.category_id, 'seller': seller.seller_id,
+            'products': [p.product_id for p in products], 'customer': customer.user_id, 'admin': admin.user_id}
+
+
+def auth_header(user_id):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
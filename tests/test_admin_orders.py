@@ -0,0 +1,34 @@
+from sqlalchemy import text
+from app.ordering import place_order
+from .conftest import auth_header
+
+
+def test_order_stats_cover_all_orders(client, session, catalog):
+    p1, p2 = catalog['products'][:2]
+    place_order(session, catalog['customer'], [{'product_id': p1, 'quantity': 1}], '-', status='Processing')
+    place_order(session, catalog['customer'], [{'product_id': p2, 'quantity': 1}], '-', status='Cancelled')
+    place_order(session, catalog['customer'], [{'product_id': p2, 'quantity': 2}], '-', status='Delivered')
+    session.commit()
+
+    resp = client.get('/api/admin/orders/stats', headers=auth_header(catalog['admin']))
+    assert resp.get_json() == {'total_orders': 3, 'pending_orders': 1, 'total_sales': 5000.0}
+    resp = client.get('/api/admin/orders/stats', query_string={'status': 'Cancelled'},
+                      headers=auth_header(catalog['admin']))
+    assert resp.get_json()['total_orders'] == 1
+
+
+def test_order_list_and_stats_are_admin_only(client, catalog):
+    for path in ('/api/admin/orders', '/api/admin/orders/stats'):
+        assert client.get(path, headers=auth_header(catalog['customer'])).status_code == 403
+
+
+def test_order_list_handles_orders_without_date(client, session, catalog):
+    session.execute(text("INSERT INTO orders (user_id, total_amount, shipping_address, status) "
+                         "VALUES (:uid, 1000, '-', 'Processing')"), {'uid': catalog['customer']})
+    session.commit()
+
+    resp = client.get('/api/admin/orders', headers=auth_header(catalog['admin']))
+    assert resp.status_code == 200
+    order = resp.get_json()['orders'][0]
+    assert order['order_date'] is None
+    assert order['user_full_name'] == 'علی رضایی'
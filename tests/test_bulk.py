@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+from sqlalchemy import func, select
+from app.models import Product
+from .conftest import auth_header
+
+
+def _import(client, catalog, body, content_type='text/csv', user='admin'):
+    return client.post('/api/admin/products/import', data=body, content_type=content_type,
+                       headers=auth_header(catalog[user]))
+
+
+def _count(session):
+    return session.scalar(select(func.count(Product.product_id)))
+
+
+def test_csv_import_counts_and_reports_line_numbers(client, session, catalog):
+    p1 = catalog['products'][0]
+    seller, category = catalog['seller'], catalog['category']
+    body = '\n'.join([
+        'product_id,seller_id,category_id,name,description,price,stock,is_active',
+        f',{seller},{category},کالای جدید,,2500,4,true',
+        f'{p1},{seller},{category},نسخه اول,,1100,5,yes',
+        f',{seller},{category},قیمت خراب,,abc,1,',
+        f'9999,{seller},{category},ناموجود,,100,1,',
+        f',{seller},99,دسته ناموجود,,100,1,',
+        f'{p1},{seller},{category},نسخه دوم,توضیح,1200,6,0',
+    ]).encode()
+
+    resp = _import(client, catalog, body)
+    assert resp.status_code == 200
+    result = resp.get_json()
+    assert (result['inserted'], result['updated'], result['rejected']) == (1, 1, 3)
+    assert [e['line'] for e in result['errors']] == [4, 6, 5]
+
+    session.expire_all()
+    product = session.get(Product, p1)
+    # ردیف تکراری همان محصول: آخرین نسخه اعمال می‌شود؛ خطاهای اعتبارسنجی قبل از «محصول ناموجود» گزارش می‌شوند
+    assert (product.name, float(product.price), product.stock, product.is_active) == ('نسخه دوم', 1200.0, 6, False)
+    assert _count(session) == 8
+
+
+def test_jsonl_import_rejects_non_object_and_broken_lines(client, session, catalog):
+    p2 = catalog['products'][1]
+    base = {'seller_id': catalog['seller'], 'category_id': catalog['category'], 'price': 10}
+    body = '\n'.join([
+        json.dumps({**base, 'name': 'از jsonl'}),
+        json.dumps([1, 2]),
+        '',
+        '{bad json',
+        json.dumps({**base, 'product_id': p2, 'name': 'به‌روز', 'stock': 3}),
+    ]).encode()
+
+    resp = _import(client, catalog, body, content_type='application/x-ndjson')
+    result = resp.get_json()
+    assert (result['inserted'], result['updated'], result['rejected']) == (1, 1, 2)
+    assert [e['line'] for e in result['errors']] == [2, 4]
+    session.expire_all()
+    assert session.get(Product, p2).name == 'به‌روز'
+
+
+def test_undecodable_file_is_rejected_without_changes(client, session, catalog):
+    body = f',{catalog["seller"]},{catalog["category"]},x,,1,1,\n'.encode() + b'\xff\xfe bad bytes'
+    resp = _import(client, catalog, b'name,seller_id,category_id,price\n' + body)
+    assert resp.status_code == 400
+    assert _count(session) == 7
+
+    resp = client.post('/api/admin/products/import?format=xml', data=b'', headers=auth_header(catalog['admin']))
+    assert resp.status_code == 400
+
+
+def test_export_round_trips_both_formats(client, catalog):
+    headers = auth_header(catalog['admin'])
+    resp = client.get('/api/admin/products/export', headers=headers)
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert [int(r['product_id']) for r in rows] == catalog['products']
+    assert rows[0]['name'] == 'محصول 1'
+
+    resp = client.get('/api/admin/products/export?format=jsonl', headers=headers)
+    lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [line['product_id'] for line in lines] == catalog['products']
+    assert lines[1]['price'] == 2000.0
+
+
+def test_bulk_endpoints_are_admin_only(client, catalog):
+    assert _import(client, catalog, b'name\n', user='customer').status_code == 403
+    resp = client.get('/api/admin/products/export', headers=auth_header(catalog['customer']))
+    assert resp.status_code == 403
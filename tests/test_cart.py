@@ -0,0 +1,92 @@
+from sqlalchemy import func, select
+from app.models import Cart, Order, Product
+from app.ordering import place_order_from_cart
+from .conftest import auth_header
+
+
+def _patch(client, catalog, *ops):
+    return client.patch('/api/cart', json={'ops': list(ops)}, headers=auth_header(catalog['customer']))
+
+
+def _lines(resp):
+    return {i['product_id']: i['quantity'] for i in resp.get_json()['items']}
+
+
+def test_ops_on_same_product_are_merged(client, catalog):
+    p1, p2, p3 = catalog['products'][:3]
+    _patch(client, catalog, {'op': 'set', 'product_id': p3, 'quantity': 4})
+    resp = _patch(client, catalog,
+                  {'op': 'set', 'product_id': p1, 'quantity': 2}, {'op': 'increment', 'product_id': p1, 'quantity': 3},
+                  {'op': 'increment', 'product_id': p2}, {'op': 'increment', 'product_id': p2},
+                  {'op': 'remove', 'product_id': p3}, {'op': 'increment', 'product_id': p3, 'quantity': 1})
+    assert resp.status_code == 200
+    assert _lines(resp) == {p1: 5, p2: 2, p3: 1}
+    assert resp.get_json()['total'] == 5 * 1000 + 2 * 2000 + 1 * 3000
+
+
+def test_quantity_is_capped(client, catalog):
+    p1, p2 = catalog['products'][:2]
+    _patch(client, catalog, {'op': 'set', 'product_id': p1, 'quantity': 5000}, {'op': 'set', 'product_id': p2, 'quantity': 999})
+    resp = _patch(client, catalog, {'op': 'increment', 'product_id': p2, 'quantity': 10})
+    assert _lines(resp) == {p1: 1000, p2: 1000}
+
+
+def test_decrement_to_zero_deletes_line(client, session, catalog):
+    p1 = catalog['products'][0]
+    _patch(client, catalog, {'op': 'set', 'product_id': p1, 'quantity': 2})
+    resp = _patch(client, catalog, {'op': 'increment', 'product_id': p1, 'quantity': -2})
+    assert _lines(resp) == {}
+    assert session.scalar(select(func.count()).select_from(Cart)) == 0
+
+
+def test_zero_or_negative_increment_does_not_create_line(client, session, catalog):
+    p1, p2 = catalog['products'][:2]
+    resp = _patch(client, catalog, {'op': 'increment', 'product_id': p1, 'quantity': 0},
+                  {'op': 'increment', 'product_id': p2, 'quantity': -3})
+    assert resp.status_code == 200
+    assert _lines(resp) == {}
+    assert session.scalar(select(func.count()).select_from(Cart)) == 0
+
+
+def test_invalid_ops_are_rejected(client, catalog):
+    p1 = catalog['products'][0]
+    assert _patch(client, catalog, {'op': 'multiply', 'product_id': p1}).status_code == 400
+    assert _patch(client, catalog, {'op': 'set', 'product_id': p1, 'quantity': -1}).status_code == 400
+    assert _patch(client, catalog, {'op': 'set', 'product_id': 9999, 'quantity': 1}).status_code == 400
+
+
+def test_web_and_bot_checkout_share_cart_path(client, session, catalog):
+    p1, p2 = catalog['products'][:2]
+    _patch(client, catalog, {'op': 'set', 'product_id': p1, 'quantity': 2}, {'op': 'set', 'product_id': p2, 'quantity': 1})
+    resp = client.post('/api/checkout', json={'shipping_address': 'تهران'}, headers=auth_header(catalog['customer']))
+    assert resp.status_code == 201
+    assert resp.get_json()['total_amount'] == 4000.0
+    assert session.get(Product, p1).stock == 8
+    assert session.scalar(select(func.count()).select_from(Cart)) == 0
+
+    # سبد خالی: وب ۴۰۰ می‌دهد و ربات None می‌گیرد
+    resp = client.post('/api/checkout', json={}, headers=auth_header(catalog['customer']))
+    assert resp.status_code == 400
+    assert place_order_from_cart(session, catalog['customer'], '-') is None
+    assert session.scalar(select(func.count(Order.order_id))) == 1
+
+
+def test_cart_checkout_keeps_lines_added_after_read(session, catalog, monkeypatch):
+    from app import ordering
+    p1, p2 = catalog['products'][:2]
+    session.add(Cart(user_id=catalog['customer'], product_id=p1, quantity=1))
+    session.commit()
+
+    reserve = ordering.reserve_stock
+
+    def reserve_then_add(s, quantities):
+        # خطی که بعد از خواندن سبد (هم‌زمان) اضافه شده در این سفارش نیست و باید در سبد بماند
+        s.add(Cart(user_id=catalog['customer'], product_id=p2, quantity=1))
+        s.flush()
+        return reserve(s, quantities)
+
+    monkeypatch.setattr(ordering, 'reserve_stock', reserve_then_add)
+    order = place_order_from_cart(session, catalog['customer'], '-')
+    session.commit()
+    assert float(order.total_amount) == 1000.0
+    assert session.execute(select(Cart.product_id)).scalars().all() == [p2]
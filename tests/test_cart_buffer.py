@@ -0,0 +1,77 @@
+from sqlalchemy import select
+from app.cart_buffer import CartWriteBuffer
+from app.extensions import cart_buffer
+from app.models import Cart
+from .conftest import auth_header
+
+
+def _cart(session):
+    session.expire_all()
+    return {(c.user_id, c.product_id): c.quantity for c in session.execute(select(Cart)).scalars()}
+
+
+def test_rapid_adds_are_coalesced_into_one_write(session, catalog):
+    buf = CartWriteBuffer(window=3600)
+    uid, (p1, p2) = catalog['customer'], catalog['products'][:2]
+    for pid in (p1, p1, p2, p1):
+        buf.add(uid, pid)
+    assert buf.stats()['pending'] == 2
+
+    assert buf.flush() == 2
+    assert _cart(session) == {(uid, p1): 3, (uid, p2): 1}
+    assert buf.stats() == {'pending': 0, 'adds': 4, 'flushes': 1, 'rows_written': 2, 'failures': 0, 'dropped': 0}
+
+
+def test_cart_read_flushes_pending_adds(client, session, catalog, monkeypatch):
+    monkeypatch.setattr(cart_buffer, 'window', 3600)
+    uid, p1 = catalog['customer'], catalog['products'][0]
+    cart_buffer.add(uid, p1)
+    cart_buffer.add(uid, p1)
+
+    resp = client.get('/api/cart', headers=auth_header(uid))
+    assert [(i['product_id'], i['quantity']) for i in resp.get_json()['items']] == [(p1, 2)]
+    assert cart_buffer.stats()['pending'] == 0
+
+
+def test_clearing_cart_discards_pending_adds(client, session, catalog, monkeypatch):
+    monkeypatch.setattr(cart_buffer, 'window', 3600)
+    uid, p1 = catalog['customer'], catalog['products'][0]
+    cart_buffer.add(uid, p1)
+
+    resp = client.delete('/api/cart', headers=auth_header(uid))
+    assert resp.get_json()['items'] == []
+    assert cart_buffer.stats()['pending'] == 0
+    cart_buffer.flush()
+    assert _cart(session) == {}
+
+
+def test_lines_of_missing_products_are_dropped(session, catalog):
+    buf = CartWriteBuffer(window=3600)
+    buf.add(catalog['customer'], 99999)
+    assert buf.flush() == 0
+    assert buf.stats()['pending'] == 0
+    assert _cart(session) == {}
+
+
+def test_failing_user_is_quarantined_and_retries_are_capped(session, catalog, monkeypatch):
+    buf = CartWriteBuffer(window=3600, max_retries=2)
+    good, bad, p1 = catalog['customer'], catalog['admin'], catalog['products'][0]
+    write = buf._write
+
+    def failing_write(lines):
+        if any(uid == bad for uid, _ in lines):
+            raise RuntimeError('boom')
+        return write(lines)
+
+    monkeypatch.setattr(buf, '_write', failing_write)
+    buf.add(good, p1)
+    buf.add(bad, p1)
+    assert buf.flush() == 1
+    assert _cart(session) == {(good, p1): 1}
+    assert buf.stats()['pending'] == 1
+
+    buf.flush()
+    assert buf.stats()['pending'] == 1
+    buf.flush()
+    assert buf.stats()['pending'] == 0
+    assert buf.stats()['dropped'] == 1
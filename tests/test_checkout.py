@@ -0,0 +1,36 @@
+from sqlalchemy import func, select
+from app.models import Order, Payment, Product
+from .conftest import auth_header
+
+
+def _checkout(client, catalog, key, quantity=2):
+    headers = {**auth_header(catalog['customer']), 'Idempotency-Key': key}
+    body = {'items': [{'product_id': catalog['products'][0], 'quantity': quantity}], 'shipping_address': 'تهران'}
+    return client.post('/api/checkout', json=body, headers=headers)
+
+
+def test_checkout_replay_returns_same_order(client, session, catalog):
+    first = _checkout(client, catalog, 'key-1')
+    assert first.status_code == 201
+    replay = _checkout(client, catalog, 'key-1')
+    assert replay.status_code == 200
+    assert replay.get_json()['order_id'] == first.get_json()['order_id']
+    assert replay.get_json()['payment']['transaction_no'] == first.get_json()['payment']['transaction_no']
+
+    assert session.scalar(select(func.count(Order.order_id))) == 1
+    assert session.scalar(select(func.count(Payment.payment_id))) == 1
+    assert session.get(Product, catalog['products'][0]).stock == 8
+
+
+def test_checkout_with_new_key_places_new_order(client, session, catalog):
+    assert _checkout(client, catalog, 'key-1').status_code == 201
+    assert _checkout(client, catalog, 'key-2').status_code == 201
+    assert session.scalar(select(func.count(Order.order_id))) == 2
+    assert session.get(Product, catalog['products'][0]).stock == 6
+
+
+def test_checkout_insufficient_stock_is_rejected_without_side_effects(client, session, catalog):
+    resp = _checkout(client, catalog, 'key-1', quantity=11)
+    assert resp.status_code == 400
+    assert session.scalar(select(func.count(Order.order_id))) == 0
+    assert session.get(Product, catalog['products'][0]).stock == 10
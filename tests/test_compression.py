@@ -0,0 +1,107 @@
+import gzip
+import json
+import os
+import zlib
+import pytest
+from flask import Flask, Response, jsonify
+from app.compression import ResponseCompressor
+
+BIG = {'items': [{'id': i, 'name': f'محصول {i}'} for i in range(200)]}
+ROWS = [{'id': i, 'name': f'محصول {i}'} for i in range(50)]
+
+
+@pytest.fixture
+def compressed():
+    app = Flask(__name__)
+    compressor = ResponseCompressor(min_size=512, brotli_quality=-1)
+    compressor.init_app(app)
+
+    @app.get('/big')
+    def big():
+        resp = jsonify(BIG)
+        resp.set_etag('v1')
+        return resp
+
+    @app.get('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.get('/encoded')
+    def encoded():
+        return Response(gzip.compress(json.dumps(BIG).encode()), mimetype='application/json',
+                        headers={'Content-Encoding': 'gzip'})
+
+    @app.get('/not-modified')
+    def not_modified():
+        return Response(status=304)
+
+    @app.get('/no-transform')
+    def no_transform():
+        resp = jsonify(BIG)
+        resp.headers['Cache-Control'] = 'no-transform'
+        return resp
+
+    @app.get('/random')
+    def random():
+        return Response(os.urandom(4096), mimetype='text/plain')
+
+    @app.get('/stream')
+    def stream():
+        return Response((json.dumps(r, ensure_ascii=False) + '\n' for r in ROWS), mimetype='application/x-ndjson')
+
+    return app.test_client(), compressor
+
+
+def _get(client, path, **kwargs):
+    return client.get(path, headers={'Accept-Encoding': 'gzip'}, **kwargs)
+
+
+def test_large_json_is_gzipped_with_weak_etag(compressed):
+    client, compressor = compressed
+    resp = _get(client, '/big')
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert resp.headers['ETag'] == 'W/"v1"'
+    assert 'Accept-Encoding' in resp.headers['Vary']
+    assert int(resp.headers['Content-Length']) == len(resp.data)
+    assert json.loads(gzip.decompress(resp.data)) == BIG
+    assert compressor.stats()['compressed'] == 1
+
+
+@pytest.mark.parametrize('path, reason', [
+    ('/small', 'small'), ('/encoded', 'encoded'), ('/not-modified', 'status'),
+    ('/no-transform', 'no_transform'), ('/random', 'incompressible'),
+])
+def test_skipped_responses_are_sent_as_is(compressed, path, reason):
+    client, compressor = compressed
+    resp = _get(client, path)
+    # پاسخی که از قبل gzip شده همان Content-Encoding خودش را نگه می‌دارد
+    assert resp.headers.get('Content-Encoding') == ('gzip' if reason == 'encoded' else None)
+    assert compressor.stats().get(f'skipped_{reason}') == 1
+    assert compressor.stats()['compressed'] == 0
+
+
+def test_client_without_gzip_gets_identity(compressed):
+    client, compressor = compressed
+    resp = client.get('/big')
+    assert 'Content-Encoding' not in resp.headers
+    assert resp.headers['ETag'] == '"v1"'
+    assert compressor.stats()['skipped_not_accepted'] == 1
+
+
+def test_head_is_passed_through(compressed):
+    client, compressor = compressed
+    resp = client.head('/big', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in resp.headers
+    assert compressor.stats() == ResponseCompressor().stats()
+
+
+def test_streamed_ndjson_decompresses_to_original(compressed):
+    client, compressor = compressed
+    resp = _get(client, '/stream', buffered=False)
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in resp.headers
+    decoder = zlib.decompressobj(31)
+    body = b''.join(decoder.decompress(chunk) for chunk in resp.response) + decoder.flush()
+    resp.close()
+    assert [json.loads(line) for line in body.decode().splitlines()] == ROWS
+    assert compressor.stats()['streamed'] == 1
@@ -0,0 +1,48 @@
+import base64
+import json
+import pytest
+from app.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def _token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('value', [1, 42, 2 ** 40])
+def test_cursor_round_trip(value):
+    assert decode_cursor(encode_cursor(value)) == value
+
+
+def test_plain_integer_cursor():
+    assert decode_cursor('17') == 17
+    assert decode_cursor('') is None
+    assert decode_cursor(None) is None
+
+
+@pytest.mark.parametrize('token', ['²', '١٢', '12a', 'not-base64!', _token({'id': 3}), _token({'after': 'x'}),
+                                   _token({'after': 1.5}), _token({'after': True}), _token({'after': None}),
+                                   _token([1, 2])])
+def test_invalid_cursor_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token)
+
+
+@pytest.mark.parametrize('token', ['²', _token({'after': 'x'}), _token({'after': [1]})])
+def test_invalid_cursor_is_400(client, catalog, token):
+    resp = client.get('/api/products', query_string={'after': token})
+    assert resp.status_code == 400
+    assert resp.get_json()['error']
+
+
+def test_products_pages_cover_catalog_once(client, catalog):
+    seen, after = [], None
+    while True:
+        resp = client.get('/api/products', query_string={'limit': 3, **({'after': after} if after else {})})
+        assert resp.status_code == 200
+        page = resp.get_json()
+        seen += [p['id'] for p in page['products']]
+        after = page['next_cursor']
+        if after is None:
+            break
+    assert sorted(seen) == sorted(catalog['products'])
+    assert len(seen) == len(set(seen))
@@ -0,0 +1,78 @@
+import re
+import pytest
+from sqlalchemy import text
+from app.instrumentation import QueryBudgetExceeded, call_site, track
+from app.ordering import place_order
+from .conftest import auth_header
+
+
+def queries(resp):
+    # after_request تعداد کوئری‌های همان درخواست را در Server-Timing می‌گذارد
+    return int(re.search(r'desc="(\d+) queries"', resp.headers['Server-Timing']).group(1))
+
+
+def _orders(session, user_id, products, n):
+    for _ in range(n):
+        place_order(session, user_id, [{'product_id': pid, 'quantity': 1} for pid in products], '-')
+    session.commit()
+
+
+def test_product_list_is_one_query(client, catalog):
+    first = client.get('/api/products', query_string={'limit': 3})
+    assert queries(first) == 1
+    second = client.get('/api/products', query_string={'limit': 3, 'after': first.get_json()['next_cursor']})
+    assert queries(second) == 1
+
+
+def test_product_list_by_category_is_one_query(client, catalog):
+    resp = client.get('/api/products', query_string={'category_id': catalog['category']})
+    assert resp.status_code == 200
+    assert queries(resp) == 1
+
+
+@pytest.mark.parametrize('path', ['/api/categories', '/api/sellers'])
+def test_reference_lists_are_cached(client, catalog, path):
+    first = client.get(path)
+    assert queries(first) == 1
+    assert queries(client.get(path)) == 0
+    etag = first.headers['ETag']
+    cached = client.get(path, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert queries(cached) == 0
+
+
+def test_order_history_query_count_is_constant(client, session, catalog):
+    headers = auth_header(catalog['customer'])
+    _orders(session, catalog['customer'], catalog['products'][:1], 1)
+    one = queries(client.get('/api/orders', headers=headers))
+    _orders(session, catalog['customer'], catalog['products'][:3], 5)
+    resp = client.get('/api/orders', headers=headers)
+    assert len(resp.get_json()) == 6
+    assert queries(resp) == one == 1
+
+
+def test_admin_order_list_query_count_is_constant(client, session, catalog):
+    headers = auth_header(catalog['admin'])
+    _orders(session, catalog['customer'], catalog['products'][:2], 2)
+    few = queries(client.get('/api/admin/orders', headers=headers))
+    _orders(session, catalog['customer'], catalog['products'][:2], 8)
+    resp = client.get('/api/admin/orders', headers=headers)
+    assert len(resp.get_json()['orders']) == 10
+    # یک کوئری برای بررسی نقش مدیر + یک کوئری برای خود فهرست/آمار
+    assert queries(resp) == few == 2
+    assert queries(client.get('/api/admin/orders/stats', headers=headers)) == 2
+
+
+def test_strict_budget_fails_the_request(app, client, catalog, monkeypatch):
+    monkeypatch.setitem(app.config, 'SQL_QUERY_BUDGET', 0)
+    monkeypatch.setitem(app.config, 'SQL_QUERY_BUDGET_STRICT', True)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/api/products')
+
+
+def test_call_site_points_at_project_code(session, catalog):
+    assert call_site(depth=1).startswith('tests/test_query_budget.py:')
+    with track('probe') as trace:
+        session.execute(text('SELECT 1'))
+    assert trace.count == 1
+    assert 'tests/test_query_budget.py:' in trace.slowest[0][2]
@@ -0,0 +1,81 @@
+import os
+import pytest
+from flask import Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine, text
+from app.replicas import FlaskRoutingSession, ReplicaRouter, STICKY_COOKIE
+
+
+@pytest.fixture
+def routed(tmp_path):
+    # دو فایل SQLite جدا؛ جدول marker در هر کدام می‌گوید کوئری به کدام دیتابیس رفته است
+    primary, replica = f'sqlite:///{tmp_path}/primary.db', f'sqlite:///{tmp_path}/replica.db'
+    for url, who in ((primary, 'primary'), (replica, 'replica')):
+        engine = create_engine(url)
+        with engine.begin() as conn:
+            conn.execute(text('CREATE TABLE marker (who TEXT)'))
+            conn.execute(text('INSERT INTO marker VALUES (:who)'), {'who': who})
+        engine.dispose()
+
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=primary, DATABASE_REPLICA_URLS=replica, REPLICA_STICKY_SECONDS=60)
+    db = SQLAlchemy(session_options={'class_': FlaskRoutingSession})
+    db.init_app(app)
+    router = ReplicaRouter()
+    router.init_app(app)
+
+    @app.route('/who', methods=['GET', 'POST'])
+    def who():
+        return jsonify(db.session.execute(text('SELECT who FROM marker LIMIT 1')).scalar())
+
+    @app.route('/write', methods=['POST'])
+    def write():
+        db.session.execute(text("INSERT INTO marker VALUES ('written')"))
+        db.session.commit()
+        return jsonify('ok')
+
+    # thread پس‌زمینه ساخته نمی‌شود؛ تست‌ها probe را خودشان با refresh() اجرا می‌کنند
+    router._pid = os.getpid()
+    router.refresh()
+    return app.test_client(), router, replica
+
+
+def test_reads_go_to_replica_and_writes_to_primary(routed):
+    client, router, _ = routed
+    assert client.get('/who').get_json() == 'replica'
+    assert client.post('/who').get_json() == 'primary'
+    assert router.stats()['replica_reads'] == 1
+
+
+def test_reads_stick_to_primary_after_write(routed):
+    client, router, _ = routed
+    assert client.post('/write').status_code == 200
+    assert client.get_cookie(STICKY_COOKIE) is not None
+    assert client.get('/who').get_json() == 'primary'
+
+    client.delete_cookie(STICKY_COOKIE)
+    assert client.get('/who').get_json() == 'replica'
+
+
+def test_failed_replica_read_is_retried_on_primary(routed):
+    client, router, replica = routed
+    engine = create_engine(replica)
+    with engine.begin() as conn:
+        conn.execute(text('DROP TABLE marker'))
+    engine.dispose()
+
+    assert client.get('/who').get_json() == 'primary'
+    assert router.stats()['retries'] == 1
+    # replica کنار گذاشته شده؛ خواندن بعدی بدون تلاش دوباره مستقیم به primary می‌رود
+    assert client.get('/who').get_json() == 'primary'
+    assert router.stats()['retries'] == 1
+
+
+def test_unprobed_or_lagging_replica_is_skipped(routed):
+    client, router, replica = routed
+    router._lag.clear()
+    assert router.pick() == (None, None)
+    router.refresh()
+    assert router.pick()[0] == replica
+    router.max_lag = -1
+    assert router.pick() == (None, None)
@@ -0,0 +1,103 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import select, text
+from app import reporting
+from app.migrations import migrate
+from app.models import SalesRollup
+from app.ordering import change_status, place_order
+from .conftest import auth_header
+
+
+def _rollups(session):
+    return {(r.product_id, r.units, float(r.revenue), r.orders)
+            for r in session.execute(select(SalesRollup)).scalars()}
+
+
+def _legacy_bot_order(session, user_id, product_id, quantity, price):
+    # همان INSERT ربات قبل از سرویس سفارش: بدون order_date و created_at
+    oid = session.execute(text("""
+        INSERT INTO orders (user_id, total_amount, shipping_address, status)
+        VALUES (:uid, :tot, '-', 'Processing') RETURNING order_id
+    """), {'uid': user_id, 'tot': quantity * price}).scalar()
+    session.execute(text("INSERT INTO order_item (order_id, product_id, quantity, item_price) "
+                         "VALUES (:oid, :pid, :qty, :pr)"), {'oid': oid, 'pid': product_id, 'qty': quantity, 'pr': price})
+    session.commit()
+    return oid
+
+
+def test_place_order_updates_rollup_and_rebuild_matches(session, catalog):
+    p1, p2 = catalog['products'][:2]
+    place_order(session, catalog['customer'], [{'product_id': p1, 'quantity': 2}, {'product_id': p2, 'quantity': 1}], '-')
+    place_order(session, catalog['customer'], [{'product_id': p1, 'quantity': 1}], '-', status='Processing')
+    place_order(session, catalog['customer'], [{'product_id': p2, 'quantity': 5}], '-', status='Cancelled')
+    session.commit()
+
+    incremental = _rollups(session)
+    assert incremental == {(p1, 3, 3000.0, 2), (p2, 1, 2000.0, 1)}
+    reporting.rebuild(session)
+    session.commit()
+    assert _rollups(session) == incremental
+
+
+def test_cancel_and_reopen_adjust_rollup(client, session, catalog):
+    p1 = catalog['products'][0]
+    order = place_order(session, catalog['customer'], [{'product_id': p1, 'quantity': 3}], '-', status='Processing')
+    session.commit()
+
+    resp = client.put(f'/api/orders/{order.order_id}/cancel', headers=auth_header(catalog['customer']))
+    assert resp.status_code == 200
+    assert _rollups(session) == {(p1, 0, 0.0, 0)}
+    assert reporting.top_products(session) == []
+
+    resp = client.put(f'/api/orders/{order.order_id}/status', json={'status': 'Processing'},
+                      headers=auth_header(catalog['admin']))
+    assert resp.status_code == 200
+    assert _rollups(session) == {(p1, 3, 3000.0, 1)}
+
+
+def test_order_without_date_is_rolled_up_and_cancellable(client, session, catalog):
+    p1 = catalog['products'][0]
+    oid = _legacy_bot_order(session, catalog['customer'], p1, 2, 1000)
+
+    reporting.rebuild(session)
+    session.commit()
+    row = session.execute(select(SalesRollup)).scalar_one()
+    assert (row.day, row.units) == (datetime.utcnow().date(), 2)
+
+    resp = client.put(f'/api/orders/{oid}/cancel', headers=auth_header(catalog['customer']))
+    assert resp.status_code == 200
+    assert _rollups(session) == {(p1, 0, 0.0, 0)}
+
+
+def test_migration_backfills_order_date_before_rebuild(session, catalog):
+    p1 = catalog['products'][0]
+    oid = _legacy_bot_order(session, catalog['customer'], p1, 1, 1000)
+    session.execute(text('DROP TABLE IF EXISTS schema_migrations'))
+    session.execute(text('DROP TABLE sales_rollup'))
+    session.commit()
+
+    migrate(session.get_bind(), log=lambda msg: None)
+
+    assert session.execute(text('SELECT order_date FROM orders WHERE order_id = :oid'), {'oid': oid}).scalar()
+    assert _rollups(session) == {(p1, 1, 1000.0, 1)}
+
+
+def test_concurrent_cancel_applies_rollup_once(session, catalog):
+    p1 = catalog['products'][0]
+    order = place_order(session, catalog['customer'], [{'product_id': p1, 'quantity': 3}], '-', status='Processing')
+    session.commit()
+
+    # هر دو درخواست قبل از commit دیگری وضعیت Processing را خوانده‌اند
+    assert change_status(session, order.order_id, 'Processing', 'Cancelled')
+    assert not change_status(session, order.order_id, 'Processing', 'Cancelled')
+    session.commit()
+    assert _rollups(session) == {(p1, 0, 0.0, 0)}
+
+
+@pytest.mark.parametrize('method, path', [
+    ('get', '/api/admin/reports/revenue'), ('get', '/api/admin/reports/top-products'),
+    ('put', '/api/orders/1/status'),
+])
+def test_reports_and_status_changes_are_admin_only(client, catalog, method, path):
+    resp = getattr(client, method)(path, json={'status': 'Shipped'}, headers=auth_header(catalog['customer']))
+    assert resp.status_code == 403
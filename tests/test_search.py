@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import text, update
+from app.migrations import migrate
+from app.models import Product
+from app.search import search_products
+
+
+def _update_trigger(session):
+    return session.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'product_search_au'")).scalar()
+
+
+def test_migration_replaces_wide_update_trigger(session, catalog):
+    if _update_trigger(session) is None:
+        pytest.skip('SQLite بدون FTS5/trigram؛ جستجو با LIKE است')
+    # trigger قدیمی که روی هر UPDATE (حتی کم‌کردن موجودی) سند FTS را بازنویسی می‌کرد
+    session.execute(text('DROP TRIGGER product_search_au'))
+    session.execute(text("""CREATE TRIGGER product_search_au AFTER UPDATE ON product BEGIN
+        INSERT INTO product_search(product_search, rowid, name, description)
+        VALUES ('delete', old.product_id, old.name, old.description);
+        INSERT INTO product_search(rowid, name, description) VALUES (new.product_id, new.name, new.description);
+    END"""))
+    session.execute(text('DROP TABLE IF EXISTS schema_migrations'))
+    session.commit()
+
+    migrate(session.get_bind(), log=lambda msg: None)
+    assert 'AFTER UPDATE OF name, description' in _update_trigger(session)
+
+    p1 = catalog['products'][0]
+    session.execute(update(Product).where(Product.product_id == p1).values(name='کتاب تازه'))
+    session.commit()
+    assert [r.product_id for r in search_products(session, 'تازه')] == [p1]